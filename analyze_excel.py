@@ -4,9 +4,16 @@ Excel Data Analysis Script
 This script analyzes your Excel files and shows the column mapping
 """
 
-import pandas as pd
 import os
 
+from loans.readers import columnar_copy, read_frame
+
+# Same workbook conversion cache as the ingestion tasks; empty disables it
+CACHE_DIR = os.environ.get(
+    'INGESTION_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.ingest_cache')
+)
+
 def analyze_excel_file(file_path, file_type):
     """Analyze Excel file structure and suggest column mappings"""
     
@@ -19,8 +26,9 @@ def analyze_excel_file(file_path, file_type):
         return False
     
     try:
-        # Read Excel file
-        df = pd.read_excel(file_path)
+        # Read the cached columnar copy, converting the workbook on first use
+        source = columnar_copy(file_path, CACHE_DIR) if CACHE_DIR else file_path
+        df = read_frame(source)
         
         print(f"File Info:")
         print(f"   - Total rows: {len(df)}")
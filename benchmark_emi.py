@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+EMI Microbenchmark
+Compares looping the scalar EMI function against the vectorized kernel
+for a full quote grid
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'credit_approval_system.settings')
+django.setup()
+
+from loans.services import LoanEligibilityService
+
+
+def main(repeat=5):
+    loan_amount = 500000.0
+    interest_rates = np.round(np.arange(0, 24.01, 0.25), 2)
+    tenures = np.arange(1, 361)
+
+    def scalar_loop():
+        return [
+            [LoanEligibilityService.calculate_monthly_emi(loan_amount, rate, tenure)
+             for tenure in tenures.tolist()]
+            for rate in interest_rates.tolist()
+        ]
+
+    def vectorized():
+        return LoanEligibilityService.calculate_monthly_emis(
+            loan_amount, interest_rates[:, np.newaxis], tenures
+        )
+
+    if not np.array_equal(np.array(scalar_loop()), vectorized()):
+        print("Vectorized EMIs differ from the scalar function")
+        return 1
+
+    cells = len(interest_rates) * len(tenures)
+    scalar_time = min(timeit.repeat(scalar_loop, number=1, repeat=repeat))
+    vector_time = min(timeit.repeat(vectorized, number=1, repeat=repeat))
+
+    print(f"Grid: {len(interest_rates)} rates x {len(tenures)} tenures = {cells} EMIs")
+    print(f"Scalar loop: {scalar_time * 1000:8.2f} ms")
+    print(f"Vectorized:  {vector_time * 1000:8.2f} ms")
+    print(f"Speedup:     {scalar_time / vector_time:8.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
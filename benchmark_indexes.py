@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Loan Index Benchmark
+Seeds a scratch copy of the loans table and compares query plans for the
+per-customer credit score, active-loan and current-year queries with only
+the foreign key index against the composite covering index from
+loans/migrations/0005_loan_date_indexes.py
+
+Usage: python benchmark_indexes.py [--loans 10000000] [--samples 200]
+The scratch table (bench_loans) is dropped afterwards; the real tables
+are never touched.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'credit_approval_system.settings')
+django.setup()
+
+from django.db import connection
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from loans.models import Loan
+from loans.services import CreditScoreCalculator
+
+TABLE = 'bench_loans'
+
+SEED_SQL = f"""
+    INSERT INTO {TABLE} (
+        loan_id, customer_id, loan_amount, tenure, interest_rate, monthly_repayment,
+        emis_paid_on_time, start_date, end_date, source_hash, created_at, updated_at
+    )
+    SELECT
+        g, 1 + g %% %s, loan_amount, tenure, 10.5, round(loan_amount / tenure * 1.1, 2),
+        (random() * tenure)::int, start_date, start_date + tenure * 30, '', now(), now()
+    FROM (
+        SELECT
+            g,
+            round((50000 + random() * 950000)::numeric, 2) AS loan_amount,
+            (6 + random() * 114)::int AS tenure,
+            date '2012-01-01' + (random() * 5400)::int AS start_date
+        FROM generate_series(1, %s) AS g
+    ) AS seeded
+"""
+
+INDEXES = {
+    'foreign key only': [
+        f"CREATE INDEX {TABLE}_customer_idx ON {TABLE} (customer_id)",
+    ],
+    'composite covering': [
+        f"CREATE INDEX {TABLE}_customer_dates_idx ON {TABLE} "
+        f"(customer_id, start_date, end_date) "
+        f"INCLUDE (loan_id, loan_amount, tenure, emis_paid_on_time, monthly_repayment)",
+    ],
+}
+
+
+def hot_queries(customer_id, today):
+    """The ORM's SQL for each hot query, pointed at the scratch table"""
+    querysets = {
+        'credit score aggregates': Loan.objects.filter(customer_id=customer_id)
+            .values('customer_id')
+            .annotate(**CreditScoreCalculator.loan_aggregates(today, prefix='')),
+        'active loans': Loan.objects.filter(
+            customer_id=customer_id, start_date__lte=today, end_date__gte=today
+        ).values('customer_id').annotate(emis=Sum('monthly_repayment')),
+        'current-year loans': Loan.objects.filter(
+            customer_id=customer_id, start_date__year=today.year
+        ).values('customer_id').annotate(loans=Count('pk')),
+    }
+    queries = {}
+    for name, queryset in querysets.items():
+        sql, params = queryset.query.sql_with_params()
+        queries[name] = (sql.replace('"loans"', f'"{TABLE}"'), params)
+    return queries
+
+
+def explain(cursor, sql, params):
+    cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)
+    return [line for line, in cursor.fetchall()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--loans', type=int, default=10_000_000)
+    parser.add_argument('--customers', type=int, help='Defaults to one per 5 loans')
+    parser.add_argument('--samples', type=int, default=200,
+                        help='Random customers timed per query')
+    args = parser.parse_args()
+    customers = args.customers or max(args.loans // 5, 1)
+    today = timezone.now().date()
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.execute(f"CREATE UNLOGGED TABLE {TABLE} (LIKE loans INCLUDING DEFAULTS)")
+        try:
+            started = time.perf_counter()
+            cursor.execute(SEED_SQL, [customers, args.loans])
+            print(f"Seeded {args.loans} loans for {customers} customers "
+                  f"in {time.perf_counter() - started:.1f}s")
+
+            sample_ids = random.sample(range(1, customers + 1), min(args.samples, customers))
+            for phase, statements in INDEXES.items():
+                cursor.execute(f"DROP INDEX IF EXISTS {TABLE}_customer_idx")
+                cursor.execute(f"DROP INDEX IF EXISTS {TABLE}_customer_dates_idx")
+                for statement in statements:
+                    cursor.execute(statement)
+                # Index-only scans need an up-to-date visibility map
+                cursor.execute(f"VACUUM ANALYZE {TABLE}")
+
+                print(f"\n{'=' * 70}\nIndexes: {phase}\n{'=' * 70}")
+                for name, (sql, params) in hot_queries(sample_ids[0], today).items():
+                    plan = explain(cursor, sql, params)
+                    timings = []
+                    for customer_id in sample_ids:
+                        sample_sql, sample_params = hot_queries(customer_id, today)[name]
+                        started = time.perf_counter()
+                        cursor.execute(sample_sql, sample_params)
+                        cursor.fetchall()
+                        timings.append(time.perf_counter() - started)
+                    timings.sort()
+
+                    print(f"\n{name}: median {timings[len(timings) // 2] * 1000:.3f} ms, "
+                          f"p95 {timings[int(len(timings) * 0.95)] * 1000:.3f} ms "
+                          f"over {len(timings)} customers")
+                    for line in plan:
+                        print(f"    {line}")
+        finally:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
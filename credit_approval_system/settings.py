@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 from decouple import config
 
@@ -34,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'loans.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -42,6 +44,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'loans.ratelimit.RateLimitMiddleware',
 ]
 
 ROOT_URLCONF = 'credit_approval_system.urls'
@@ -63,6 +66,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'credit_approval_system.wsgi.application'
+ASGI_APPLICATION = 'credit_approval_system.asgi.application'
 
 
 # Database
@@ -144,6 +148,81 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Lets async loan job status report STARTED while the worker runs it
+CELERY_TASK_TRACK_STARTED = True
+
+# Rows written per bulk upsert during data ingestion
+INGESTION_BATCH_SIZE = config('INGESTION_BATCH_SIZE', default=5000, cast=int)
+
+# Rows handled by each task when ingestion fans out across Celery workers
+INGESTION_CHUNK_ROWS = config('INGESTION_CHUNK_ROWS', default=50000, cast=int)
+
+# Parquet copies of source workbooks, keyed by workbook hash; empty disables
+INGESTION_CACHE_DIR = config('INGESTION_CACHE_DIR', default=str(BASE_DIR / '.ingest_cache'))
+
+# Cache Configuration
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_URL', default='redis://redis:6379/1'),
+    }
+}
+
+# Credit scores depend on the current date, so entries never need to outlive a day
+CREDIT_SCORE_CACHE_TIMEOUT = config('CREDIT_SCORE_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+
+# Seconds to keep serialized view-loan responses in the shared cache; 0 disables
+LOAN_RESPONSE_CACHE_TIMEOUT = config('LOAN_RESPONSE_CACHE_TIMEOUT', default=0, cast=int)
+
+# Seconds a create-loan response is replayed for a repeated Idempotency-Key,
+# and how long a duplicate waits for the first request to finish
+IDEMPOTENCY_KEY_TIMEOUT = config('IDEMPOTENCY_KEY_TIMEOUT', default=60 * 60 * 24, cast=int)
+IDEMPOTENCY_LOCK_TIMEOUT = config('IDEMPOTENCY_LOCK_TIMEOUT', default=30, cast=int)
+
+# Token buckets for the loans API as (burst capacity, refills per second).
+# Each endpoint has one bucket shared by everyone, one per client and one
+# per customer_id in the request.
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
+RATE_LIMIT_REDIS_URL = config('RATE_LIMIT_REDIS_URL', default=CACHES['default']['LOCATION'])
+RATE_LIMITS = {
+    'endpoint': (
+        config('RATE_LIMIT_ENDPOINT_BURST', default=500, cast=int),
+        config('RATE_LIMIT_ENDPOINT_RATE', default=200, cast=float),
+    ),
+    'client': (
+        config('RATE_LIMIT_CLIENT_BURST', default=60, cast=int),
+        config('RATE_LIMIT_CLIENT_RATE', default=20, cast=float),
+    ),
+    'customer': (
+        config('RATE_LIMIT_CUSTOMER_BURST', default=10, cast=int),
+        config('RATE_LIMIT_CUSTOMER_RATE', default=1, cast=float),
+    ),
+}
+# Clients are told apart by this header when set (e.g. an API gateway's
+# consumer ID), otherwise by address
+RATE_LIMIT_CLIENT_HEADER = config('RATE_LIMIT_CLIENT_HEADER', default='')
+# Requests to the loans views in flight across all processes before new
+# ones are shed; a slot lapses after RATE_LIMIT_SLOT_TIMEOUT seconds
+RATE_LIMIT_MAX_CONCURRENCY = config('RATE_LIMIT_MAX_CONCURRENCY', default=64, cast=int)
+RATE_LIMIT_SLOT_TIMEOUT = config('RATE_LIMIT_SLOT_TIMEOUT', default=30, cast=int)
+
+# Prometheus metrics shared by all processes through Redis, served at /metrics
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_REDIS_URL = config('METRICS_REDIS_URL', default=CACHES['default']['LOCATION'])
+
+# Keep the test suite independent of a running Redis
+TESTING = 'test' in sys.argv
+
+if TESTING:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    CELERY_BROKER_URL = 'memory://'
+    CELERY_RESULT_BACKEND = 'cache+memory://'
+    RATE_LIMIT_ENABLED = False
+    METRICS_ENABLED = False
 
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = DEBUG
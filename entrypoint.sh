@@ -15,7 +15,7 @@ python manage.py migrate
 python manage.py create_superuser
 
 # Load initial data if it doesn't exist
-python manage.py load_data
+python manage.py load_data --copy
 
 # Execute the main command
 exec "$@"
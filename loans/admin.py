@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Customer, Loan
+from .models import Customer, CustomerCreditProfile, IngestionManifest, IngestionRun, Loan
 
 
 @admin.register(Customer)
@@ -18,3 +18,25 @@ class LoanAdmin(admin.ModelAdmin):
     list_filter = ['interest_rate', 'tenure', 'start_date']
     search_fields = ['customer__first_name', 'customer__last_name']
     readonly_fields = ['loan_id', 'created_at', 'updated_at']
+
+
+@admin.register(CustomerCreditProfile)
+class CustomerCreditProfileAdmin(admin.ModelAdmin):
+    list_display = ['customer', 'total_loans', 'current_year_loans',
+                   'active_remaining_amount', 'active_monthly_repayment', 'emi_headroom', 'as_of']
+    search_fields = ['customer__first_name', 'customer__last_name']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(IngestionManifest)
+class IngestionManifestAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'file_name', 'checksum', 'rows_processed', 'ingested_at']
+    readonly_fields = ['ingested_at']
+
+
+@admin.register(IngestionRun)
+class IngestionRunAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'file_name', 'status', 'start_row', 'stop_row',
+                   'next_row', 'rows_processed', 'started_at', 'updated_at']
+    list_filter = ['kind', 'status']
+    readonly_fields = ['started_at', 'updated_at']
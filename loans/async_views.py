@@ -0,0 +1,115 @@
+"""
+Async variants of the read-heavy views, for serving under ASGI.
+DRF 3.14 has no async views, so these are plain Django async views that
+reuse the serializers and mirror the sync views' responses. Every query
+goes through the async ORM, so a slow database parks a coroutine rather
+than a worker thread.
+"""
+
+import json
+
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Customer, Loan
+from .pagination import LoanCursorPagination
+from .serializers import EligibilityCheckSerializer, LoanDetailSerializer, LoanSerializer
+from .services import LoanEligibilityService
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def _not_found():
+    return _json({'detail': 'Not found.'}, status=404)
+
+
+def _allow(*methods):
+    """
+    Reject other HTTP methods with 405. Django 4.2's own method decorators
+    wrap views in sync functions, which would hide the coroutine from the
+    handler.
+    """
+    def decorator(view):
+        async def wrapped(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            return await view(request, *args, **kwargs)
+        wrapped.__name__ = view.__name__
+        wrapped.__doc__ = view.__doc__
+        # JSON API like the DRF views, which are csrf exempt too
+        wrapped.csrf_exempt = True
+        return wrapped
+    return decorator
+
+
+@_allow('POST')
+async def check_eligibility(request):
+    """
+    Async check_eligibility
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError as exc:
+        return _json({'detail': f'JSON parse error - {exc}'}, status=400)
+
+    serializer = EligibilityCheckSerializer(data=payload)
+    if not serializer.is_valid():
+        return _json(serializer.errors, status=400)
+
+    eligibility_result = await LoanEligibilityService.acheck_eligibility(
+        serializer.validated_data['customer_id'],
+        serializer.validated_data['loan_amount'],
+        serializer.validated_data['interest_rate'],
+        serializer.validated_data['tenure'],
+    )
+    return _json(eligibility_result)
+
+
+@_allow('GET')
+async def view_loan(request, loan_id):
+    """
+    Async view_loan, one query
+    """
+    try:
+        loan = await Loan.objects.select_related('customer').aget(loan_id=loan_id)
+    except Loan.DoesNotExist:
+        return _not_found()
+    return _json(LoanDetailSerializer(loan).data)
+
+
+@_allow('GET')
+async def view_customer_loans(request, customer_id):
+    """
+    Async view_customer_loans. Pages are keyed on loan_id like the sync
+    view's cursor, but exposed as a plain ?after=<loan_id> so they can be
+    built without DRF's request wrapper.
+    """
+    try:
+        customer = await Customer.objects.aget(customer_id=customer_id)
+    except Customer.DoesNotExist:
+        return _not_found()
+
+    try:
+        after = int(request.GET.get('after', 0))
+        page_size = int(request.GET.get('page_size', LoanCursorPagination.page_size))
+    except ValueError:
+        return _json({'detail': 'after and page_size must be integers.'}, status=400)
+    page_size = max(1, min(page_size, LoanCursorPagination.max_page_size))
+
+    loans = (
+        Loan.objects.filter(customer=customer, loan_id__gt=after)
+        .order_by('loan_id')[:page_size + 1]
+    )
+    page = [loan async for loan in loans]
+
+    next_url = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        query = request.GET.copy()
+        query['after'] = page[-1].loan_id
+        next_url = request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+    serializer = LoanSerializer(page, many=True, context={'customer': customer})
+    return _json({'next': next_url, 'results': serializer.data})
@@ -0,0 +1,178 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+
+def invalidate_with_commit(invalidate, ids):
+    """
+    Call ``invalidate(ids)`` now and again once the current transaction
+    commits, so a reader racing the open transaction cannot leave an entry
+    computed from the old rows behind
+    """
+    invalidate(ids)
+    transaction.on_commit(lambda: invalidate(ids))
+
+
+class CreditScoreCache:
+    """
+    Cache credit scores per customer and day, with hit/miss counters.
+    Entries are dropped whenever the customer's loans or limits change.
+    """
+
+    KEY_PREFIX = 'credit_score'
+    HITS_KEY = 'credit_score:hits'
+    MISSES_KEY = 'credit_score:misses'
+
+    @staticmethod
+    def key(customer_id, day=None):
+        if day is None:
+            day = timezone.now().date()
+        return f'{CreditScoreCache.KEY_PREFIX}:{customer_id}:{day.isoformat()}'
+
+    @staticmethod
+    def get_or_compute(customer_id, compute):
+        """
+        Return the cached score for today, calling ``compute()`` on a miss
+        """
+        key = CreditScoreCache.key(customer_id)
+        score = cache.get(key)
+        if score is not None:
+            CreditScoreCache._count(CreditScoreCache.HITS_KEY)
+            return score
+
+        CreditScoreCache._count(CreditScoreCache.MISSES_KEY)
+        score = compute()
+        cache.set(key, score, settings.CREDIT_SCORE_CACHE_TIMEOUT)
+        return score
+
+    @staticmethod
+    async def aget_or_compute(customer_id, compute):
+        """
+        get_or_compute through the cache's async API; ``compute`` must not
+        touch the database
+        """
+        key = CreditScoreCache.key(customer_id)
+        score = await cache.aget(key)
+        if score is not None:
+            await CreditScoreCache._acount(CreditScoreCache.HITS_KEY)
+            return score
+
+        await CreditScoreCache._acount(CreditScoreCache.MISSES_KEY)
+        score = compute()
+        await cache.aset(key, score, settings.CREDIT_SCORE_CACHE_TIMEOUT)
+        return score
+
+    @staticmethod
+    def invalidate(customer_ids):
+        keys = [CreditScoreCache.key(customer_id) for customer_id in customer_ids]
+        if keys:
+            cache.delete_many(keys)
+
+    @staticmethod
+    def stats():
+        counts = cache.get_many([CreditScoreCache.HITS_KEY, CreditScoreCache.MISSES_KEY])
+        hits = counts.get(CreditScoreCache.HITS_KEY, 0)
+        misses = counts.get(CreditScoreCache.MISSES_KEY, 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+    @staticmethod
+    def _count(key):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+    @staticmethod
+    async def _acount(key):
+        try:
+            await cache.aincr(key)
+        except ValueError:
+            await cache.aset(key, 1, None)
+
+
+class LoanResponseCache:
+    """
+    Optional shared cache of serialized view-loan responses, enabled by
+    LOAN_RESPONSE_CACHE_TIMEOUT. Each entry remembers the ETag it was built
+    for and is only served while that ETag is current, so a write that
+    bypasses the invalidation signals can never serve stale data.
+    """
+
+    KEY_PREFIX = 'loan_response'
+
+    @staticmethod
+    def enabled():
+        return settings.LOAN_RESPONSE_CACHE_TIMEOUT > 0
+
+    @staticmethod
+    def key(loan_id):
+        return f'{LoanResponseCache.KEY_PREFIX}:{loan_id}'
+
+    @staticmethod
+    def get(loan_id, etag):
+        if not LoanResponseCache.enabled():
+            return None
+        entry = cache.get(LoanResponseCache.key(loan_id))
+        if entry is None or entry['etag'] != etag:
+            return None
+        return entry['data']
+
+    @staticmethod
+    def set(loan_id, etag, data):
+        if LoanResponseCache.enabled():
+            cache.set(
+                LoanResponseCache.key(loan_id),
+                {'etag': etag, 'data': data},
+                settings.LOAN_RESPONSE_CACHE_TIMEOUT
+            )
+
+    @staticmethod
+    def invalidate(loan_ids):
+        keys = [LoanResponseCache.key(loan_id) for loan_id in loan_ids]
+        if keys:
+            cache.delete_many(keys)
+
+
+class IdempotencyCache:
+    """
+    Stored responses for Idempotency-Key requests, plus the lock that lets
+    only one request per key run the view at a time
+    """
+
+    KEY_PREFIX = 'idempotency'
+
+    @staticmethod
+    def key(scope, idempotency_key):
+        return f'{IdempotencyCache.KEY_PREFIX}:{scope}:{idempotency_key}'
+
+    @staticmethod
+    def get(scope, idempotency_key):
+        return cache.get(IdempotencyCache.key(scope, idempotency_key))
+
+    @staticmethod
+    def set(scope, idempotency_key, fingerprint, status, data):
+        cache.set(
+            IdempotencyCache.key(scope, idempotency_key),
+            {'fingerprint': fingerprint, 'status': status, 'data': data},
+            settings.IDEMPOTENCY_KEY_TIMEOUT
+        )
+
+    @staticmethod
+    def acquire(scope, idempotency_key):
+        """
+        Take the key's lock; cache.add is atomic, so only one caller wins.
+        The lock expires on its own if its holder dies.
+        """
+        return cache.add(
+            f'{IdempotencyCache.key(scope, idempotency_key)}:lock', 1,
+            settings.IDEMPOTENCY_LOCK_TIMEOUT
+        )
+
+    @staticmethod
+    def release(scope, idempotency_key):
+        cache.delete(f'{IdempotencyCache.key(scope, idempotency_key)}:lock')
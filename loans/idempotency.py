@@ -0,0 +1,83 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import IdempotencyCache
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+# Seconds between checks while another request holds the key
+POLL_INTERVAL = 0.05
+
+
+def idempotent(view):
+    """
+    Honour an Idempotency-Key header on a DRF function view; apply it
+    below @api_view. The first response for a key is stored and replayed
+    to every retry with the same body, without running the view again.
+    A duplicate that arrives while the first is still running waits for
+    its response instead of running in parallel. Server errors are not
+    stored, so those requests can be retried.
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not idempotency_key:
+            return view(request, *args, **kwargs)
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            return Response(
+                {'detail': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        scope = request.path
+        fingerprint = hashlib.sha256(request.body).hexdigest()
+        deadline = time.monotonic() + settings.IDEMPOTENCY_LOCK_TIMEOUT
+
+        while True:
+            stored = IdempotencyCache.get(scope, idempotency_key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+
+            if IdempotencyCache.acquire(scope, idempotency_key):
+                break
+
+            if time.monotonic() >= deadline:
+                return Response(
+                    {'detail': 'A request with this Idempotency-Key is still in progress.'},
+                    status=status.HTTP_409_CONFLICT,
+                    headers={'Retry-After': '1'}
+                )
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            # The holder of an expired lock may have finished meanwhile
+            stored = IdempotencyCache.get(scope, idempotency_key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+
+            response = view(request, *args, **kwargs)
+            if response.status_code < 500:
+                IdempotencyCache.set(
+                    scope, idempotency_key, fingerprint, response.status_code, response.data
+                )
+            return response
+        finally:
+            IdempotencyCache.release(scope, idempotency_key)
+
+    return wrapped
+
+
+def _replay(stored, fingerprint):
+    if stored['fingerprint'] != fingerprint:
+        return Response(
+            {'detail': f'{IDEMPOTENCY_HEADER} was already used with a different request body.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return Response(stored['data'], status=stored['status'], headers={REPLAYED_HEADER: 'true'})
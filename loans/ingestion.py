@@ -0,0 +1,595 @@
+"""
+Bulk write helpers used by the data ingestion tasks
+"""
+import hashlib
+import io
+import json
+import os
+import time
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .metrics import record_ingestion
+from .models import Customer, IngestionManifest, IngestionRun, Loan
+from .readers import columnar_copy, file_checksum, iter_chunks
+from .services import CreditProfileService
+
+# Cap on row errors kept in a task result; rows_failed still counts all of them
+MAX_REPORTED_ERRORS = 100
+
+CUSTOMER_UPDATE_FIELDS = [
+    'first_name', 'last_name', 'age', 'phone_number', 'monthly_salary',
+    'approved_limit', 'current_debt', 'source_hash', 'updated_at',
+]
+
+LOAN_UPDATE_FIELDS = [
+    'customer', 'loan_amount', 'tenure', 'interest_rate', 'monthly_repayment',
+    'emis_paid_on_time', 'start_date', 'end_date', 'source_hash', 'updated_at',
+]
+
+
+class IngestionReport:
+    """Created/updated/unchanged counters plus row-level errors for one ingestion run"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row, error, **identifiers):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, **identifiers, 'error': str(error)})
+
+    def as_dict(self):
+        return {
+            f'{self.kind}_created': self.created,
+            f'{self.kind}_updated': self.updated,
+            f'{self.kind}_unchanged': self.unchanged,
+            'rows_failed': self.failed,
+            'errors': self.errors,
+        }
+
+    def add_rejects(self, rejects):
+        """Record every row of a normalize_customers/normalize_loans rejects frame"""
+        identifiers = rejects.drop(columns='error').to_dict('records')
+        for index, error, ids in zip(rejects.index, rejects['error'], identifiers):
+            self.add_error(index, error, **ids)
+
+    @classmethod
+    def from_dict(cls, kind, data):
+        """Rebuild a report saved with as_dict(), e.g. from a checkpoint"""
+        report = cls(kind)
+        report.created = data.get(f'{kind}_created', 0)
+        report.updated = data.get(f'{kind}_updated', 0)
+        report.unchanged = data.get(f'{kind}_unchanged', 0)
+        report.failed = data.get('rows_failed', 0)
+        report.errors = list(data.get('errors', []))
+        return report
+
+
+def ingest_file(upsert, kind, file_path, batch_size, start=0, stop=None,
+                refresh_profiles=True, force=False, checksum=None, resume=False):
+    """
+    Stream rows [start, stop) of ``file_path`` through ``upsert`` (one of
+    upsert_customers/upsert_loans) one batch at a time, so memory stays flat
+    however large the file is. Returns the report and the number of rows read.
+
+    The pass is recorded as an IngestionRun and each batch commits together
+    with its checkpoint. With ``resume``, an unfinished run over the same
+    file contents and row range carries on after its last committed batch.
+    """
+    if checksum is None:
+        checksum = file_checksum(file_path)
+    source = columnar_source(file_path, checksum)
+    run = _start_run(kind, file_path, checksum, start, stop, resume)
+    report = IngestionReport.from_dict(kind, run.report)
+    total = run.rows_processed
+
+    try:
+        for chunk in iter_chunks(source, batch_size, run.next_row, stop):
+            started = time.perf_counter()
+            with transaction.atomic():
+                _, customer_ids = upsert(chunk, batch_size, report, force=force)
+                if refresh_profiles:
+                    CreditProfileService.refresh(customer_ids)
+                total += len(chunk)
+                _save_run(run, next_row=int(chunk.index[-1]) + 1, rows_processed=total,
+                          report=report.as_dict())
+            record_ingestion(kind, len(chunk), time.perf_counter() - started)
+    except Exception:
+        _save_run(run, status=IngestionRun.FAILED)
+        raise
+
+    _save_run(run, status=IngestionRun.COMPLETED)
+    return report, total
+
+
+def columnar_source(file_path, checksum=None):
+    """
+    File to read ``file_path``'s rows from: its cached Parquet copy when
+    INGESTION_CACHE_DIR is set. Row positions (checkpoints, chunk ranges,
+    error rows) refer to whichever file this returns.
+    """
+    if not settings.INGESTION_CACHE_DIR:
+        return file_path
+    return columnar_copy(file_path, settings.INGESTION_CACHE_DIR, checksum)
+
+
+def _start_run(kind, file_path, checksum, start, stop, resume):
+    """The unfinished run to resume, or a new run"""
+    if resume:
+        run = (
+            IngestionRun.objects
+            .filter(kind=kind, checksum=checksum, start_row=start, stop_row=stop)
+            .exclude(status=IngestionRun.COMPLETED)
+            .order_by('-started_at')
+            .first()
+        )
+        if run is not None:
+            _save_run(run, status=IngestionRun.RUNNING)
+            return run
+
+    return IngestionRun.objects.create(
+        kind=kind,
+        file_name=os.path.basename(file_path),
+        checksum=checksum,
+        start_row=start,
+        stop_row=stop,
+        next_row=start,
+    )
+
+
+def _save_run(run, **fields):
+    """Update only ``fields`` (plus updated_at) on ``run``"""
+    for name, value in fields.items():
+        setattr(run, name, value)
+    run.save(update_fields=[*fields, 'updated_at'])
+
+
+def merge_reports(kind, results):
+    """Combine per-chunk task results into one result of the same shape"""
+    failures = [result for result in results if result.get('status') != 'success']
+    if failures:
+        return {
+            'status': 'error',
+            'message': '; '.join(result.get('message', 'Unknown error') for result in failures)
+        }
+
+    errors = [error for result in results for error in result['errors']]
+    return {
+        'status': 'success',
+        f'{kind}_created': sum(result[f'{kind}_created'] for result in results),
+        f'{kind}_updated': sum(result[f'{kind}_updated'] for result in results),
+        f'{kind}_unchanged': sum(result[f'{kind}_unchanged'] for result in results),
+        'rows_failed': sum(result['rows_failed'] for result in results),
+        'errors': errors[:MAX_REPORTED_ERRORS],
+        'total_processed': sum(result['total_processed'] for result in results),
+    }
+
+
+# Table each kind of source file is ingested into
+KIND_MODELS = {'customers': Customer, 'loans': Loan}
+
+
+def file_unchanged(kind, checksum):
+    """
+    Whether ``checksum`` matches the last file fully ingested for ``kind``
+    and the table still holds the rows it had then. A table that lost rows
+    since (e.g. it was emptied) gets the file ingested again.
+    """
+    manifest = IngestionManifest.objects.filter(kind=kind, checksum=checksum).first()
+    if manifest is None or manifest.table_rows is None:
+        return False
+    return KIND_MODELS[kind].objects.count() >= manifest.table_rows
+
+
+def record_manifest(kind, file_path, checksum, rows_processed):
+    """
+    Remember ``file_path`` as the last file fully ingested for ``kind``.
+    Runs with failed rows are not recorded, so the same file is retried in
+    full next time (e.g. once missing customers have been loaded).
+    """
+    IngestionManifest.objects.update_or_create(
+        kind=kind,
+        defaults={
+            'file_name': os.path.basename(file_path),
+            'checksum': checksum,
+            'rows_processed': rows_processed,
+            'table_rows': KIND_MODELS[kind].objects.count(),
+        }
+    )
+
+
+def unchanged_file_result(kind):
+    """Task result for a file skipped because it matches the manifest"""
+    return {
+        'status': 'success',
+        'skipped': True,
+        **IngestionReport(kind).as_dict(),
+        'total_processed': 0,
+    }
+
+
+# Source column names accepted for each field, in order of preference
+CUSTOMER_COLUMNS = {
+    'customer_id': ['Customer ID', 'customer_id'],
+    'first_name': ['First Name', 'first_name'],
+    'last_name': ['Last Name', 'last_name'],
+    'age': ['Age', 'age'],
+    'phone_number': ['Phone Number', 'phone_number'],
+    'monthly_salary': ['Monthly Salary', 'monthly_salary'],
+    'approved_limit': ['Approved Limit', 'approved_limit'],
+    'current_debt': ['Current Debt', 'current_debt'],
+}
+
+LOAN_COLUMNS = {
+    'customer_id': ['Customer ID', 'customer_id'],
+    'loan_id': ['Loan ID', 'loan_id'],
+    'loan_amount': ['Loan Amount', 'Principal', 'loan_amount'],
+    'tenure': ['Tenure', 'tenure'],
+    'interest_rate': ['Interest Rate', 'interest_rate'],
+    'monthly_repayment': ['Monthly payment', 'monthly_repayment'],
+    'emis_paid_on_time': ['EMIs paid on Time', 'emis_paid_on_time'],
+    'start_date': ['Date of Approval', 'start_date'],
+    'end_date': ['End Date', 'end_date'],
+}
+
+
+def row_hash(fields):
+    """Content hash of normalized field values, stored as ``source_hash``"""
+    payload = json.dumps(fields, sort_keys=True, default=str)
+    return hashlib.md5(payload.encode(), usedforsecurity=False).hexdigest()
+
+
+def normalize_customers(df):
+    """
+    Resolve header aliases and coerce ``df`` column by column into Customer
+    field values. Returns (clean, rejects), both indexed by source row:
+    ``clean`` has one typed column per field, ``rejects`` the customer ID
+    and reason for every invalid row.
+    """
+    source = _SourceColumns(df, CUSTOMER_COLUMNS)
+    salary = source.number('monthly_salary', "Invalid monthly salary")
+    approved_limit = source.number('approved_limit', "Invalid approved limit", default=0)
+
+    phone_numbers = source.raw('phone_number')
+    source.reject(phone_numbers.isna(), "Missing phone number")
+    if pd.api.types.is_float_dtype(phone_numbers):
+        # A blank cell turns a column of numbers into floats
+        phone_numbers = phone_numbers.fillna(0).astype('int64')
+
+    clean = pd.DataFrame({
+        'customer_id': source.integer('customer_id', "Missing or invalid customer ID"),
+        'first_name': source.text('first_name'),
+        'last_name': source.text('last_name'),
+        'age': source.integer('age', "Invalid age"),
+        'phone_number': phone_numbers.astype(str),
+        'monthly_salary': salary,
+        # bulk_create skips Customer.save(), which normally fills this in
+        'approved_limit': approved_limit.where(approved_limit != 0, (36 * salary).round(-5)),
+        'current_debt': source.number('current_debt', "Invalid current debt", default=0),
+    }, index=df.index)
+    return source.split(clean, 'customer_id')
+
+
+def normalize_loans(df):
+    """
+    Resolve header aliases and coerce ``df`` column by column into Loan
+    field values, including ``customer_id``. Returns (clean, rejects) as
+    normalize_customers does; rejects are keyed by loan ID. Whether the
+    customers exist is left to the caller.
+    """
+    source = _SourceColumns(df, LOAN_COLUMNS)
+    clean = pd.DataFrame({
+        'customer_id': source.integer('customer_id', "Missing or invalid customer ID"),
+        'loan_id': source.integer('loan_id', "Missing or invalid loan ID"),
+        'loan_amount': source.number('loan_amount', "Invalid loan amount"),
+        'tenure': source.integer('tenure', "Invalid tenure"),
+        'interest_rate': source.number('interest_rate', "Invalid interest rate"),
+        'monthly_repayment': source.number('monthly_repayment', "Invalid monthly repayment"),
+        'emis_paid_on_time': source.integer('emis_paid_on_time', "Invalid EMIs paid on time"),
+        'start_date': source.date('start_date', "Invalid start date"),
+        'end_date': source.date('end_date', "Invalid end date"),
+    }, index=df.index)
+    return source.split(clean, 'loan_id')
+
+
+class _SourceColumns:
+    """
+    Whole-column coercions over one source frame. Header aliases are
+    resolved once up front, and each row keeps the first reason it failed.
+    """
+
+    def __init__(self, df, aliases):
+        self.df = df
+        self.columns = {
+            field: next((name for name in names if name in df.columns), None)
+            for field, names in aliases.items()
+        }
+        self.reasons = pd.Series(None, index=df.index, dtype=object)
+
+    def reject(self, mask, reason):
+        self.reasons = self.reasons.mask(mask & self.reasons.isna(), reason)
+
+    def raw(self, field):
+        """Source column for ``field``, or all blanks if the file lacks it"""
+        column = self.columns[field]
+        if column is None:
+            return pd.Series(None, index=self.df.index, dtype=object)
+        return self.df[column]
+
+    def number(self, field, reason, default=None):
+        """
+        Column as floats. Cells that are not numbers reject their row;
+        blank cells take ``default``, or are rejected when it is None.
+        """
+        raw = self.raw(field)
+        values = pd.to_numeric(raw, errors='coerce').astype('float64')
+        self.reject(raw.notna() & values.isna(), reason)
+        if default is None:
+            self.reject(values.isna(), reason)
+            return values
+        return values.fillna(default)
+
+    def integer(self, field, reason, default=None):
+        # Truncates like int(), so 12.0 and "12" are both 12
+        return self.number(field, reason, default).fillna(0).astype('int64')
+
+    def text(self, field):
+        return self.raw(field).fillna('').astype(str)
+
+    def date(self, field, reason):
+        values = pd.to_datetime(self.raw(field), errors='coerce', format='ISO8601')
+        self.reject(values.isna(), reason)
+        return values.dt.date
+
+    def split(self, clean, key):
+        """Valid rows of ``clean`` and the rejects frame for the rest"""
+        invalid = self.reasons.notna()
+        keys = self.raw(key)[invalid].astype(object)
+        rejects = pd.DataFrame({
+            key: keys.where(keys.notna(), None),
+            'error': self.reasons[invalid],
+        })
+        return clean[~invalid], rejects
+
+
+def upsert_customers(df, batch_size, report=None, force=False):
+    """
+    Insert or update the customers in ``df`` with one ON CONFLICT upsert
+    per batch. Rows whose content hash matches the stored ``source_hash``
+    are left alone unless ``force`` is set. Returns the report and the set
+    of customer IDs written.
+    """
+    if report is None:
+        report = IngestionReport('customers')
+    written_ids = set()
+
+    clean, rejects = normalize_customers(df)
+    report.add_rejects(rejects)
+    clean = _drop_repeated_keys(clean, 'customer_id', report)
+
+    for start in range(0, len(clean), batch_size):
+        batch = clean.iloc[start:start + batch_size]
+        customers = {
+            fields['customer_id']: (index, Customer(source_hash=row_hash(fields), **fields))
+            for index, fields in zip(batch.index, batch.to_dict('records'))
+        }
+
+        existing_hashes = dict(
+            Customer.objects.filter(customer_id__in=customers.keys())
+            .values_list('customer_id', 'source_hash')
+        )
+        if not force:
+            customers = _drop_unchanged(customers, existing_hashes, report)
+        existing_ids = set(existing_hashes)
+        saved_ids = _bulk_upsert(
+            Customer, customers, 'customer_id', CUSTOMER_UPDATE_FIELDS, report
+        )
+
+        report.created += len(saved_ids - existing_ids)
+        report.updated += len(saved_ids & existing_ids)
+        written_ids |= saved_ids
+
+    return report, written_ids
+
+
+def upsert_loans(df, batch_size, report=None, force=False):
+    """
+    Insert or update the loans in ``df``. Each batch costs a constant number
+    of queries: one in_bulk lookup of the referenced customers, one lookup
+    of existing loan hashes and one ON CONFLICT upsert. Rows whose content
+    hash is unchanged are skipped unless ``force`` is set. Returns the
+    report and the set of customer IDs whose loans were written.
+    """
+    if report is None:
+        report = IngestionReport('loans')
+    touched_customer_ids = set()
+
+    clean, rejects = normalize_loans(df)
+    report.add_rejects(rejects)
+    clean = _drop_repeated_keys(clean, 'loan_id', report)
+
+    for start in range(0, len(clean), batch_size):
+        batch = clean.iloc[start:start + batch_size]
+
+        known_customers = Customer.objects.only('customer_id').in_bulk(
+            batch['customer_id'].unique().tolist()
+        )
+        batch = _drop_orphans(batch, known_customers, report)
+        loans = {
+            fields['loan_id']: (index, Loan(source_hash=row_hash(fields), **fields))
+            for index, fields in zip(batch.index, batch.to_dict('records'))
+        }
+
+        existing_hashes = dict(
+            Loan.objects.filter(loan_id__in=loans.keys()).values_list('loan_id', 'source_hash')
+        )
+        if not force:
+            loans = _drop_unchanged(loans, existing_hashes, report)
+        existing_ids = set(existing_hashes)
+        saved_ids = _bulk_upsert(Loan, loans, 'loan_id', LOAN_UPDATE_FIELDS, report)
+
+        report.created += len(saved_ids - existing_ids)
+        report.updated += len(saved_ids & existing_ids)
+        touched_customer_ids.update(loans[loan_id][1].customer_id for loan_id in saved_ids)
+
+    return report, touched_customer_ids
+
+
+def copy_customers(df, report=None):
+    """
+    Load customers into an empty table with PostgreSQL COPY. Rows are
+    normalized exactly as for upsert_customers. Returns the report.
+    """
+    if report is None:
+        report = IngestionReport('customers')
+    started = time.perf_counter()
+    frame, rejects = normalize_customers(df)
+    report.add_rejects(rejects)
+    frame = _drop_repeated_keys(frame, 'customer_id', report)
+
+    _copy_frame(Customer, _with_hashes(frame))
+    report.created += len(frame)
+    record_ingestion('customers', len(df), time.perf_counter() - started)
+    return report
+
+
+def copy_loans(df, report=None):
+    """
+    Load loans into an empty table with PostgreSQL COPY, dropping rows for
+    customers that do not exist. Returns the report.
+    """
+    if report is None:
+        report = IngestionReport('loans')
+    started = time.perf_counter()
+    frame, rejects = normalize_loans(df)
+    report.add_rejects(rejects)
+    frame = _drop_repeated_keys(frame, 'loan_id', report)
+
+    if len(frame):
+        known_ids = Customer.objects.filter(
+            customer_id__in=frame['customer_id'].unique().tolist()
+        ).values_list('customer_id', flat=True)
+        frame = _drop_orphans(frame, list(known_ids), report)
+
+    _copy_frame(Loan, _with_hashes(frame))
+    report.created += len(frame)
+    record_ingestion('loans', len(df), time.perf_counter() - started)
+    return report
+
+
+def _drop_repeated_keys(frame, key_field, report):
+    """
+    Keep the last row for each key, as row-by-row saves would have left it,
+    counting the earlier ones as updates
+    """
+    repeated = frame.duplicated(key_field, keep='last')
+    report.updated += int(repeated.sum())
+    return frame[~repeated]
+
+
+def _drop_orphans(frame, known_customer_ids, report):
+    """Reject loan rows whose customer is not in ``known_customer_ids``"""
+    orphaned = ~frame['customer_id'].isin(list(known_customer_ids))
+    for index, customer_id in frame.loc[orphaned, 'customer_id'].items():
+        report.add_error(index, "Customer not found", customer_id=int(customer_id))
+    return frame[~orphaned]
+
+
+def _with_hashes(frame):
+    return frame.assign(source_hash=[row_hash(fields) for fields in frame.to_dict('records')])
+
+
+def _copy_frame(model, frame):
+    """Stream ``frame`` into the model's table through an in-memory CSV buffer"""
+    if not len(frame):
+        return
+
+    now = timezone.now()
+    frame = frame.assign(created_at=now, updated_at=now)
+    columns = [
+        field.column for field in model._meta.concrete_fields
+        if field.column in frame.columns
+    ]
+
+    # Missing values are written as \N so that empty strings (blank names)
+    # stay empty strings; COPY would read a bare empty field as NULL
+    buffer = io.StringIO()
+    frame[columns].to_csv(buffer, index=False, header=False, na_rep=r'\N')
+    buffer.seek(0)
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    column_list = ', '.join(connection.ops.quote_name(column) for column in columns)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer
+        )
+
+
+def _drop_unchanged(rows, existing_hashes, report):
+    """
+    Remove rows (key -> (source row index, instance)) whose content hash
+    matches the stored one, counting them as unchanged
+    """
+    changed = {}
+    for key, (index, obj) in rows.items():
+        if existing_hashes.get(key) == obj.source_hash:
+            report.unchanged += 1
+        else:
+            changed[key] = (index, obj)
+    return changed
+
+
+def _bulk_upsert(model, rows, key_field, update_fields, report):
+    """
+    Upsert ``rows`` (key -> (source row index, instance)) in one statement.
+    If the batch violates a constraint, fall back to per-row upserts so one
+    bad row only rejects itself. Returns the keys that were written.
+    """
+    if not rows:
+        return set()
+    objs = [obj for _, obj in rows.values()]
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(
+                objs,
+                update_conflicts=True,
+                unique_fields=[key_field],
+                update_fields=update_fields,
+            )
+        return set(rows.keys())
+    except IntegrityError:
+        pass
+
+    saved = set()
+    for key, (index, obj) in rows.items():
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    [obj],
+                    update_conflicts=True,
+                    unique_fields=[key_field],
+                    update_fields=update_fields,
+                )
+            saved.add(key)
+        except IntegrityError as e:
+            report.add_error(index, e, **{key_field: key})
+    return saved
+
+
+def reset_sequences(*models):
+    """Move AutoField sequences past IDs inserted explicitly from source files"""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
@@ -1,5 +1,5 @@
-from django.core.management.base import BaseCommand
-from loans.tasks import ingest_all_data
+from django.core.management.base import BaseCommand, CommandError
+from loans.tasks import copy_all_data, ingest_all_data, ingest_all_data_parallel
 from loans.models import Customer, Loan
 
 
@@ -10,14 +10,32 @@ class Command(BaseCommand):
         parser.add_argument(
             '--async',
             action='store_true',
-            help='Run data ingestion as async Celery task',
+            help='Run data ingestion as async Celery tasks fanned out across workers',
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Bulk load the empty tables with PostgreSQL COPY instead of ORM upserts',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue interrupted ingestion runs from their last committed batch',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Ingest even if customers or loans already exist (unchanged files and rows are still skipped)',
         )
 
     def handle(self, *args, **options):
+        if options['copy'] and (options['resume'] or options['force']):
+            raise CommandError('--copy only loads empty tables and cannot be combined with --resume or --force')
+
         customer_count = Customer.objects.count()
         loan_count = Loan.objects.count()
         
-        if customer_count > 0 or loan_count > 0:
+        if (customer_count > 0 or loan_count > 0) and not (options['resume'] or options['force']):
             self.stdout.write(
                 self.style.WARNING(
                     f'Data already exists: {customer_count} customers, {loan_count} loans. Skipping ingestion.'
@@ -25,28 +43,43 @@ class Command(BaseCommand):
             )
             return
 
+        kwargs = {}
+        if options['copy']:
+            ingest = copy_all_data
+        elif options['async']:
+            # Spread ORM ingestion over the worker pool
+            ingest = ingest_all_data_parallel
+            kwargs['resume'] = options['resume']
+        else:
+            ingest = ingest_all_data
+            kwargs['resume'] = options['resume']
+
         if options['async']:
             # Run as Celery task
             self.stdout.write('Starting async data ingestion...')
-            task = ingest_all_data.delay()
+            task = ingest.delay(**kwargs)
             self.stdout.write(
                 self.style.SUCCESS(f'Task started with ID: {task.id}')
             )
         else:
             # Run synchronously
             self.stdout.write('Starting synchronous data ingestion...')
-            result = ingest_all_data()
+            result = ingest(**kwargs)
             
             customer_result = result.get('customer_ingestion', {})
             loan_result = result.get('loan_ingestion', {})
             
-            if customer_result.get('status') == 'success':
+            if customer_result.get('skipped'):
+                self.stdout.write("Customers: file unchanged since last ingestion, skipped")
+            elif customer_result.get('status') == 'success':
                 self.stdout.write(
                     self.style.SUCCESS(
                         f"Customers: {customer_result.get('customers_created', 0)} created, "
-                        f"{customer_result.get('customers_updated', 0)} updated"
+                        f"{customer_result.get('customers_updated', 0)} updated, "
+                        f"{customer_result.get('customers_unchanged', 0)} unchanged"
                     )
                 )
+                self._report_row_errors('Customers', customer_result)
             else:
                 self.stdout.write(
                     self.style.ERROR(
@@ -54,16 +87,29 @@ class Command(BaseCommand):
                     )
                 )
             
-            if loan_result.get('status') == 'success':
+            if loan_result.get('skipped'):
+                self.stdout.write("Loans: file unchanged since last ingestion, skipped")
+            elif loan_result.get('status') == 'success':
                 self.stdout.write(
                     self.style.SUCCESS(
                         f"Loans: {loan_result.get('loans_created', 0)} created, "
-                        f"{loan_result.get('loans_updated', 0)} updated"
+                        f"{loan_result.get('loans_updated', 0)} updated, "
+                        f"{loan_result.get('loans_unchanged', 0)} unchanged"
                     )
                 )
+                self._report_row_errors('Loans', loan_result)
             else:
                 self.stdout.write(
                     self.style.ERROR(
                         f"Loan ingestion failed: {loan_result.get('message', 'Unknown error')}"
                     )
                 )
+
+    def _report_row_errors(self, label, result):
+        if not result.get('rows_failed'):
+            return
+        self.stdout.write(
+            self.style.WARNING(f"{label}: {result['rows_failed']} rows failed")
+        )
+        for error in result.get('errors', []):
+            self.stdout.write(f"  row {error['row']}: {error['error']}")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from loans.services import CreditProfileService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild customer credit profiles from the loans table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'customer_ids',
+            nargs='*',
+            type=int,
+            help='Only rebuild these customers (default: all customers)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of customers aggregated per query',
+        )
+
+    def handle(self, *args, **options):
+        customer_ids = options['customer_ids'] or None
+        written = CreditProfileService.refresh(
+            customer_ids, chunk_size=options['chunk_size']
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {written} credit profiles')
+        )
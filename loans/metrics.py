@@ -0,0 +1,359 @@
+"""
+Prometheus metrics kept in Redis, so every web and Celery process adds to
+the same series and /metrics reports the totals whichever process serves
+it. Each metric family is one Redis hash; an observation is a single
+pipelined round trip. Recording never raises: if Redis is unavailable the
+sample is dropped and logged.
+"""
+
+import inspect
+import logging
+import re
+import time
+from functools import wraps
+
+import redis
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+
+from .cache import CreditScoreCache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'metrics'
+
+# Modules whose views are measured per request
+API_VIEW_MODULES = ('loans.views', 'loans.async_views')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+LE_LABEL = re.compile(r'le="([^"]*)",?')
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'http_request_duration_seconds': (
+        'histogram', 'Time to build, or for streams to send, the response of a loans API view',
+        LATENCY_BUCKETS,
+    ),
+    'http_request_db_queries': (
+        'histogram', 'Database queries run per loans API request', QUERY_COUNT_BUCKETS,
+    ),
+    'http_request_db_duration_seconds': (
+        'histogram', 'Time spent in database queries per loans API request', LATENCY_BUCKETS,
+    ),
+    'scoring_duration_seconds': (
+        'histogram', 'Time to score a customer or decide an application', LATENCY_BUCKETS,
+    ),
+    'cache_requests_total': (
+        'counter', 'Cache lookups by cache and result', None,
+    ),
+    'ingestion_rows_total': (
+        'counter', 'Source rows ingested', None,
+    ),
+    'ingestion_duration_seconds_total': (
+        'counter', 'Time spent ingesting source rows', None,
+    ),
+    'ingestion_rows_per_second': (
+        'gauge', 'Rows per second of the most recent ingestion batch', None,
+    ),
+}
+
+
+def _label_string(labels):
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in sorted(labels.items())
+    )
+    return ','.join(f'{name}="{value}"' for name, value in escaped)
+
+
+def _series_order(sample):
+    """
+    Group a histogram's series by labels, with buckets first in bound order
+    """
+    (suffix, labels), _ = sample
+    bound = LE_LABEL.search(labels)
+    return (
+        LE_LABEL.sub('', labels).strip(','),
+        suffix != '_bucket',
+        suffix,
+        float(bound.group(1)) if bound else 0.0,
+    )
+
+
+def _format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Metrics:
+    """
+    Record and render the metric families in METRICS. Hash fields are
+    ``suffix|labels``, where the labels of histogram buckets include le.
+    """
+
+    _default = None
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def default(cls):
+        if cls._default is None:
+            cls._default = cls(redis.Redis.from_url(settings.METRICS_REDIS_URL))
+        return cls._default
+
+    @staticmethod
+    def key(name):
+        return f'{KEY_PREFIX}:{name}'
+
+    def _write(self, name, fields, increments=True):
+        if not settings.METRICS_ENABLED:
+            return
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for field, value in fields:
+                if not increments:
+                    pipe.hset(self.key(name), field, value)
+                elif isinstance(value, int):
+                    pipe.hincrby(self.key(name), field, value)
+                else:
+                    pipe.hincrbyfloat(self.key(name), field, value)
+            pipe.execute()
+        except redis.RedisError:
+            logger.warning("Could not record metric %s", name, exc_info=True)
+
+    def inc(self, name, amount=1, **labels):
+        self._write(name, [(f'|{_label_string(labels)}', amount)])
+
+    def set(self, name, value, **labels):
+        self._write(name, [(f'|{_label_string(labels)}', value)], increments=False)
+
+    def observe(self, name, value, **labels):
+        """
+        Add ``value`` to a histogram. Buckets are stored cumulatively, so
+        the observation increments every bucket whose bound it fits under;
+        the others are touched with 0 so each series has all its buckets.
+        """
+        buckets = METRICS[name][2]
+        fields = [
+            (f'_bucket|{_label_string({**labels, "le": _format_value(bound)})}', int(value <= bound))
+            for bound in buckets
+        ]
+        fields += [
+            (f'_bucket|{_label_string({**labels, "le": "+Inf"})}', 1),
+            (f'_sum|{_label_string(labels)}', float(value)),
+            (f'_count|{_label_string(labels)}', 1),
+        ]
+        self._write(name, fields)
+
+    def render(self):
+        """
+        Every recorded series in the Prometheus text exposition format
+        """
+        pipe = self.client.pipeline(transaction=False)
+        for name in METRICS:
+            pipe.hgetall(self.key(name))
+        families = dict(zip(METRICS, pipe.execute()))
+
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            series = sorted(
+                ((field.decode().split('|', 1), value.decode())
+                 for field, value in families[name].items()),
+                key=_series_order
+            )
+            for (suffix, labels), value in series:
+                lines.append(f'{name}{suffix}{{{labels}}} {_format_value(value)}'
+                             if labels else f'{name}{suffix} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def timed(name, **labels):
+    """
+    Observe how long each call of the decorated function takes. For a
+    generator function that is the time spent producing its items, which
+    is where its work happens, not the time the caller holds it open.
+    Coroutine functions record from a worker thread, off the event loop.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapped_coroutine(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    await sync_to_async(Metrics.default().observe)(
+                        name, time.perf_counter() - started, **labels
+                    )
+            return wrapped_coroutine
+
+        if inspect.isgeneratorfunction(func):
+            @wraps(func)
+            def wrapped_generator(*args, **kwargs):
+                generator = func(*args, **kwargs)
+                elapsed = 0.0
+                try:
+                    while True:
+                        started = time.perf_counter()
+                        try:
+                            item = next(generator)
+                        except StopIteration:
+                            return
+                        finally:
+                            elapsed += time.perf_counter() - started
+                        yield item
+                finally:
+                    generator.close()
+                    Metrics.default().observe(name, elapsed, **labels)
+            return wrapped_generator
+
+        @wraps(func)
+        def wrapped(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                Metrics.default().observe(name, time.perf_counter() - started, **labels)
+        return wrapped
+    return decorator
+
+
+def record_cache_lookup(cache_name, hit):
+    Metrics.default().inc('cache_requests_total', cache=cache_name, result='hit' if hit else 'miss')
+
+
+def record_ingestion(kind, rows, seconds):
+    metrics = Metrics.default()
+    metrics.inc('ingestion_rows_total', rows, kind=kind)
+    metrics.inc('ingestion_duration_seconds_total', float(seconds), kind=kind)
+    if seconds > 0:
+        metrics.set('ingestion_rows_per_second', rows / seconds, kind=kind)
+
+
+class QueryTimer:
+    """
+    connection.execute_wrapper hook counting queries and their total time
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def _add_query_timer(queries):
+    connection.execute_wrappers.append(queries)
+
+
+def _remove_query_timer(queries):
+    connection.execute_wrappers.remove(queries)
+
+
+def _timed_stream(content, queries):
+    """
+    Pass ``content`` through, timing the queries run to produce each chunk
+    """
+    content = iter(content)
+    while True:
+        with connection.execute_wrapper(queries):
+            try:
+                chunk = next(content)
+            except StopIteration:
+                return
+        yield chunk
+
+
+class MetricsMiddleware:
+    """
+    Record latency and database load for every request served by a loans
+    API view, labelled by URL name. Streaming responses keep querying while
+    the body is sent, so they are recorded when the response is closed.
+    Runs natively under both WSGI and ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        queries = QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        return self.measure(request, response, started, queries)
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+
+        # Under ASGI, queries run in the request's worker thread on that
+        # thread's connection, so the timer is installed there
+        queries = QueryTimer()
+        started = time.perf_counter()
+        await sync_to_async(_add_query_timer)(queries)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_query_timer)(queries)
+        return await sync_to_async(self.measure)(request, response, started, queries)
+
+    def measure(self, request, response, started, queries):
+        match = request.resolver_match
+        if match is None or match.func.__module__ not in API_VIEW_MODULES:
+            return response
+
+        if response.streaming and not response.is_async:
+            response.streaming_content = _timed_stream(response.streaming_content, queries)
+            response._resource_closers.append(
+                lambda: self.record(request, response, match, time.perf_counter() - started, queries)
+            )
+        else:
+            self.record(request, response, match, time.perf_counter() - started, queries)
+        return response
+
+    @staticmethod
+    def record(request, response, match, elapsed, queries):
+        metrics = Metrics.default()
+        metrics.observe('http_request_duration_seconds', elapsed, view=match.url_name,
+                        method=request.method, status=response.status_code)
+        metrics.observe('http_request_db_queries', queries.count, view=match.url_name)
+        metrics.observe('http_request_db_duration_seconds', queries.seconds, view=match.url_name)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint
+    """
+    # The credit score cache keeps its own hit/miss counters
+    stats = CreditScoreCache.stats()
+    metrics = Metrics.default()
+    try:
+        metrics.set('cache_requests_total', stats['hits'], cache='credit_score', result='hit')
+        metrics.set('cache_requests_total', stats['misses'], cache='credit_score', result='miss')
+        body = metrics.render()
+    except redis.RedisError:
+        logger.warning("Could not read metrics", exc_info=True)
+        return HttpResponse('metrics store unavailable\n', status=503, content_type='text/plain')
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerCreditProfile',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='credit_profile', serialize=False, to='loans.customer')),
+                ('total_loans', models.IntegerField(default=0)),
+                ('total_emis', models.IntegerField(default=0)),
+                ('total_paid_on_time', models.IntegerField(default=0)),
+                ('current_year_loans', models.IntegerField(default=0)),
+                ('active_remaining_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('active_monthly_repayment', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('emi_headroom', models.DecimalField(decimal_places=2, default=0, help_text='50% of monthly salary minus active EMIs', max_digits=14)),
+                ('as_of', models.DateField(help_text='Date the active and current-year figures refer to')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'customer_credit_profiles',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0002_customercreditprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionManifest',
+            fields=[
+                ('kind', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('file_name', models.CharField(max_length=255)),
+                ('checksum', models.CharField(help_text='SHA-256 of the file contents', max_length=64)),
+                ('rows_processed', models.IntegerField(default=0)),
+                ('ingested_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'ingestion_manifests',
+            },
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='source_hash',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Content hash of the source file row this record was last ingested from', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='source_hash',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Content hash of the source file row this record was last ingested from', max_length=32),
+        ),
+    ]
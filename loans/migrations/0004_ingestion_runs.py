@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0003_delta_ingestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('file_name', models.CharField(max_length=255)),
+                ('checksum', models.CharField(help_text='SHA-256 of the file contents', max_length=64)),
+                ('start_row', models.IntegerField(default=0)),
+                ('stop_row', models.IntegerField(blank=True, null=True)),
+                ('next_row', models.IntegerField(default=0, help_text='First row not yet committed')),
+                ('rows_processed', models.IntegerField(default=0)),
+                ('report', models.JSONField(default=dict, help_text='Counters and row errors so far')),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'ingestion_runs',
+            },
+        ),
+    ]
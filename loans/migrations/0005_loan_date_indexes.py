@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:40
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, and avoids
+    # blocking loan writes while a large table is indexed
+    atomic = False
+
+    dependencies = [
+        ('loans', '0004_ingestion_runs'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='loan',
+            index=models.Index(fields=['customer', 'start_date', 'end_date'], include=('loan_id', 'loan_amount', 'tenure', 'emis_paid_on_time', 'monthly_repayment'), name='loans_customer_dates_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0005_loan_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestionmanifest',
+            name='table_rows',
+            field=models.IntegerField(blank=True, help_text='Rows in the table right after the file was ingested', null=True),
+        ),
+    ]
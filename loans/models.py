@@ -12,6 +12,10 @@ class Customer(models.Model):
     monthly_salary = models.DecimalField(max_digits=12, decimal_places=2)
     approved_limit = models.DecimalField(max_digits=12, decimal_places=2)
     current_debt = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    source_hash = models.CharField(
+        max_length=32, blank=True, default='', editable=False,
+        help_text="Content hash of the source file row this record was last ingested from"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -41,11 +45,28 @@ class Loan(models.Model):
     emis_paid_on_time = models.IntegerField(default=0)
     start_date = models.DateField()
     end_date = models.DateField()
+    source_hash = models.CharField(
+        max_length=32, blank=True, default='', editable=False,
+        help_text="Content hash of the source file row this record was last ingested from"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'loans'
+        indexes = [
+            # Per-customer active (start_date <= today <= end_date) and
+            # current-year lookups are range scans on this index; Django
+            # compiles start_date__year to a start_date range, so no
+            # expression index is needed. The included columns are
+            # everything the credit score and profile aggregates read, so
+            # those run as index-only scans.
+            models.Index(
+                fields=['customer', 'start_date', 'end_date'],
+                include=['loan_id', 'loan_amount', 'tenure', 'emis_paid_on_time', 'monthly_repayment'],
+                name='loans_customer_dates_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Loan {self.loan_id} - {self.customer.first_name} {self.customer.last_name}"
@@ -62,3 +83,80 @@ class Loan(models.Model):
         """Calculate remaining loan amount"""
         total_paid = self.emis_paid_on_time * self.monthly_repayment
         return max(0, self.loan_amount - total_paid)
+
+
+class CustomerCreditProfile(models.Model):
+    """Denormalized per-customer loan aggregates used by eligibility checks"""
+    customer = models.OneToOneField(
+        Customer, on_delete=models.CASCADE, primary_key=True, related_name='credit_profile'
+    )
+    total_loans = models.IntegerField(default=0)
+    total_emis = models.IntegerField(default=0)
+    total_paid_on_time = models.IntegerField(default=0)
+    current_year_loans = models.IntegerField(default=0)
+    active_remaining_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    active_monthly_repayment = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    emi_headroom = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        help_text="50% of monthly salary minus active EMIs"
+    )
+    as_of = models.DateField(help_text="Date the active and current-year figures refer to")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'customer_credit_profiles'
+
+    def __str__(self):
+        return f"Credit profile for customer {self.customer_id}"
+
+
+class IngestionManifest(models.Model):
+    """Checksum of the last source file fully ingested for each kind of data"""
+    kind = models.CharField(max_length=20, primary_key=True)
+    file_name = models.CharField(max_length=255)
+    checksum = models.CharField(max_length=64, help_text="SHA-256 of the file contents")
+    rows_processed = models.IntegerField(default=0)
+    table_rows = models.IntegerField(
+        null=True, blank=True,
+        help_text="Rows in the table right after the file was ingested"
+    )
+    ingested_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ingestion_manifests'
+
+    def __str__(self):
+        return f"{self.kind}: {self.file_name} ({self.checksum[:12]})"
+
+
+class IngestionRun(models.Model):
+    """
+    One ingestion pass over a source file, or over a row range of it for
+    parallel chunks. Progress is checkpointed after every committed batch.
+    """
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20)
+    file_name = models.CharField(max_length=255)
+    checksum = models.CharField(max_length=64, help_text="SHA-256 of the file contents")
+    start_row = models.IntegerField(default=0)
+    stop_row = models.IntegerField(null=True, blank=True)
+    next_row = models.IntegerField(default=0, help_text="First row not yet committed")
+    rows_processed = models.IntegerField(default=0)
+    report = models.JSONField(default=dict, help_text="Counters and row errors so far")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=RUNNING)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ingestion_runs'
+
+    def __str__(self):
+        return f"{self.kind} run {self.pk} ({self.status}, next row {self.next_row})"
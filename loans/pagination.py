@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class LoanCursorPagination(CursorPagination):
+    """
+    Keyset pagination on loan_id. Each page is one ``loan_id > cursor``
+    range query, so deep pages cost the same as the first. The default
+    page size is REST_FRAMEWORK['PAGE_SIZE']; clients may ask for up to
+    ``max_page_size`` with ``?page_size=``.
+    """
+    ordering = 'loan_id'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
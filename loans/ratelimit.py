@@ -0,0 +1,249 @@
+"""
+Redis-backed admission control for the loans API: token buckets per
+customer, per client and per endpoint, and a global budget of concurrent
+database-bound requests. Both checks are Lua scripts, so every web process
+shares the same counters and each decision is a single atomic round trip.
+"""
+
+import json
+import logging
+import time
+import uuid
+
+import redis
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+
+from .metrics import API_VIEW_MODULES
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ratelimit'
+
+# KEYS are bucket hashes; ARGV is now (ms) followed by a capacity and a
+# refill rate (tokens per second) for each key. A token is taken from every
+# bucket or from none; on refusal the script returns the milliseconds until
+# the emptiest bucket holds a token again.
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local elapsed = math.max(0, now - (tonumber(bucket[2]) or now))
+    tokens = math.min(capacity, tokens + elapsed * rate / 1000)
+    if tokens < 1 then
+        wait = math.max(wait, math.ceil((1 - tokens) * 1000 / rate))
+    end
+    levels[i] = tokens
+end
+if wait > 0 then
+    return wait
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - 1), 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity * 1000 / rate))
+end
+return 0
+"""
+
+# KEYS[1] is a sorted set of in-flight request IDs scored by when their slot
+# lapses, so slots held by crashed workers free themselves. ARGV is now (ms),
+# the budget, the request ID and the slot lifetime (ms). Returns 1 when a
+# slot was taken.
+CONCURRENCY_SCRIPT = """
+local now = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[4]), ARGV[3])
+redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[4]))
+return 1
+"""
+
+
+class RateLimiter:
+    """
+    Token buckets and the concurrency budget over one Redis connection
+    """
+
+    CONCURRENCY_KEY = f'{KEY_PREFIX}:inflight'
+
+    _default = None
+
+    def __init__(self, client):
+        self.client = client
+        self._take_tokens = client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._take_slot = client.register_script(CONCURRENCY_SCRIPT)
+
+    @classmethod
+    def default(cls):
+        if cls._default is None:
+            cls._default = cls(redis.Redis.from_url(settings.RATE_LIMIT_REDIS_URL))
+        return cls._default
+
+    @staticmethod
+    def _now():
+        return int(time.time() * 1000)
+
+    def take(self, buckets, now=None):
+        """
+        Take one token from each of ``buckets``, a list of (name, capacity,
+        refill per second). Returns 0 when admitted, otherwise the seconds
+        to wait before retrying.
+        """
+        if not buckets:
+            return 0
+        args = [self._now() if now is None else now]
+        for _, capacity, rate in buckets:
+            args += [capacity, rate]
+        keys = [f'{KEY_PREFIX}:bucket:{name}' for name, _, _ in buckets]
+        wait_ms = self._take_tokens(keys=keys, args=args)
+        return -(-wait_ms // 1000)
+
+    def acquire_slot(self, limit, timeout, now=None):
+        """
+        Claim one of ``limit`` concurrent slots for at most ``timeout``
+        seconds. Returns the slot ID, or None when the budget is spent.
+        """
+        slot = uuid.uuid4().hex
+        taken = self._take_slot(
+            keys=[self.CONCURRENCY_KEY],
+            args=[self._now() if now is None else now, limit, slot, timeout * 1000],
+        )
+        return slot if taken else None
+
+    def release_slot(self, slot):
+        self.client.zrem(self.CONCURRENCY_KEY, slot)
+
+
+def _client_id(request):
+    header = settings.RATE_LIMIT_CLIENT_HEADER
+    if header and request.headers.get(header):
+        return request.headers[header]
+    return request.META.get('REMOTE_ADDR', 'unknown')
+
+
+def _customer_id(request, view_kwargs):
+    """
+    The customer a request is about, from the URL or a JSON object body.
+    Bulk requests name many customers and are covered by the client and
+    endpoint buckets only.
+    """
+    if 'customer_id' in view_kwargs:
+        return view_kwargs['customer_id']
+    if request.method != 'POST' or request.content_type != 'application/json':
+        return None
+    try:
+        body = json.loads(request.body)
+    except ValueError:
+        return None
+    if isinstance(body, dict) and isinstance(body.get('customer_id'), int):
+        return body['customer_id']
+    return None
+
+
+def _too_many_requests(detail, retry_after):
+    response = JsonResponse({'detail': detail}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def _release_slot(slot):
+    try:
+        RateLimiter.default().release_slot(slot)
+    except redis.RedisError:
+        logger.warning("Could not release concurrency slot %s", slot, exc_info=True)
+
+
+def _release_when_sent(request, response):
+    """
+    Hand back the request's concurrency slot. Streaming views keep querying
+    the database while the body is sent, so theirs is handed back when the
+    server closes the response.
+    """
+    slot = getattr(request, '_rate_limit_slot', None)
+    if slot is None:
+        return
+    if response is not None and response.streaming:
+        response._resource_closers.append(lambda: _release_slot(slot))
+    else:
+        _release_slot(slot)
+
+
+class RateLimitMiddleware:
+    """
+    Admit requests to the loans views through the token buckets, then hold
+    a concurrency slot until the response has been sent. Refused requests
+    get 429 with Retry-After. If Redis is unreachable, requests are let
+    through rather than failing the API. Runs natively under both WSGI and
+    ASGI, so async views stay on the event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            _release_when_sent(request, response)
+
+    async def __acall__(self, request):
+        response = None
+        try:
+            response = await self.get_response(request)
+            return response
+        finally:
+            await sync_to_async(_release_when_sent)(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Django runs this in a worker thread when serving under ASGI
+        if not settings.RATE_LIMIT_ENABLED:
+            return None
+        if view_func.__module__ not in API_VIEW_MODULES:
+            return None
+
+        endpoint = request.resolver_match.url_name
+        limits = settings.RATE_LIMITS
+        buckets = [
+            (f'endpoint:{endpoint}', *limits['endpoint']),
+            (f'client:{_client_id(request)}:{endpoint}', *limits['client']),
+        ]
+        customer_id = _customer_id(request, view_kwargs)
+        if customer_id is not None:
+            buckets.append((f'customer:{customer_id}:{endpoint}', *limits['customer']))
+
+        try:
+            limiter = RateLimiter.default()
+            retry_after = limiter.take(buckets)
+            if retry_after:
+                return _too_many_requests('Rate limit exceeded.', retry_after)
+
+            slot = limiter.acquire_slot(
+                settings.RATE_LIMIT_MAX_CONCURRENCY, settings.RATE_LIMIT_SLOT_TIMEOUT
+            )
+        except redis.RedisError:
+            logger.warning("Rate limiter unavailable; admitting request", exc_info=True)
+            return None
+
+        if slot is None:
+            return _too_many_requests('Server is at capacity, retry shortly.', 1)
+        request._rate_limit_slot = slot
+        return None
@@ -0,0 +1,232 @@
+"""
+Streaming readers for ingestion source files
+
+Every reader yields pandas DataFrames of at most ``chunk_size`` rows, indexed
+by each row's position in the file (0 = first data row), so memory use does
+not grow with the file. The format is picked from the file extension.
+
+Parsing workbook XML dominates read time, so columnar_copy() converts a
+workbook once, chunk by chunk, into a Parquet file named by its hash;
+later reads stream memory-mapped row groups instead.
+"""
+import csv
+import hashlib
+import itertools
+import os
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+CSV_EXTENSIONS = ('.csv',)
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+
+# Rows per row group in converted copies; readers decode one group at a time
+PARQUET_ROW_GROUP_SIZE = 50000
+
+
+def iter_chunks(file_path, chunk_size, start=0, stop=None):
+    """Yield data rows [start, stop) of ``file_path`` in chunks"""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in EXCEL_EXTENSIONS:
+        chunks = _iter_excel(file_path, chunk_size, start, stop)
+    elif extension in CSV_EXTENSIONS:
+        chunks = _iter_csv(file_path, chunk_size, start, stop)
+    elif extension in PARQUET_EXTENSIONS:
+        chunks = _iter_parquet(file_path, chunk_size, start, stop)
+    else:
+        raise ValueError(f"Unsupported file type: {extension or file_path}")
+
+    for chunk in chunks:
+        if len(chunk):
+            yield chunk
+
+
+def read_frame(file_path):
+    """Whole file as one DataFrame, for callers that need every row at once"""
+    chunks = list(iter_chunks(file_path, chunk_size=50000))
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks)
+
+
+def count_rows(file_path):
+    """Number of data rows (excluding the header) in ``file_path``"""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in EXCEL_EXTENSIONS:
+        workbook = openpyxl.load_workbook(file_path, read_only=True)
+        try:
+            worksheet = workbook.worksheets[0]
+            if worksheet.max_row is None:
+                worksheet.reset_dimensions()
+                total = sum(1 for _ in worksheet.iter_rows(values_only=True))
+            else:
+                total = worksheet.max_row
+        finally:
+            workbook.close()
+        return max(total - 1, 0)
+    if extension in CSV_EXTENSIONS:
+        with open(file_path, newline='') as f:
+            return max(sum(1 for _ in _csv_records(f)) - 1, 0)
+    if extension in PARQUET_EXTENSIONS:
+        return pq.ParquetFile(file_path, memory_map=True).metadata.num_rows
+    raise ValueError(f"Unsupported file type: {extension or file_path}")
+
+
+def file_checksum(file_path, block_size=1 << 20):
+    """SHA-256 hex digest of the raw file bytes"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def columnar_copy(file_path, cache_dir, checksum=None):
+    """
+    Path of a Parquet copy of the workbook at ``file_path`` in ``cache_dir``,
+    converting it on first use. Copies are named by the workbook's SHA-256,
+    so an edited workbook gets a new copy. Blank rows are dropped, which
+    renumbers the rows below them.
+
+    Non-Excel files, and workbooks Arrow cannot type (such as a column mixing
+    numbers and text), are returned as is and read directly.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in EXCEL_EXTENSIONS:
+        return file_path
+
+    checksum = checksum or file_checksum(file_path)
+    cached_path = os.path.join(cache_dir, f'{checksum}.parquet')
+    unsupported_path = os.path.join(cache_dir, f'{checksum}.unsupported')
+    if os.path.exists(cached_path):
+        return cached_path
+    if os.path.exists(unsupported_path):
+        return file_path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # Convert one chunk at a time, so the workbook is never held in memory
+    # whole. Write under a private name and rename, so concurrent workers
+    # never read a half-written copy.
+    temp_path = f'{cached_path}.{os.getpid()}.tmp'
+    writer = None
+    try:
+        for chunk in iter_chunks(file_path, PARQUET_ROW_GROUP_SIZE):
+            chunk = chunk.reset_index(drop=True)
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                # Later chunks are cast to the first one's types; a column
+                # that changes type part way down fails the cast
+                writer = pq.ParquetWriter(temp_path, table.schema)
+            else:
+                table = table.cast(writer.schema)
+            writer.write_table(table, row_group_size=PARQUET_ROW_GROUP_SIZE)
+
+        if writer is None:
+            # A workbook with no data rows
+            pq.write_table(pa.table({}), temp_path)
+        else:
+            writer.close()
+        os.replace(temp_path, cached_path)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        open(unsupported_path, 'w').close()
+        return file_path
+    finally:
+        # Whatever failed, leave no open writer or partial copy behind
+        try:
+            if writer is not None:
+                writer.close()
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    return cached_path
+
+
+def _iter_excel(file_path, chunk_size, start, stop):
+    # Read-only mode parses the sheet XML lazily instead of building it in memory
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        # openpyxl pads rows to the sheet width; trailing unnamed columns are noise
+        width = max((i + 1 for i, name in enumerate(header) if name is not None), default=0)
+        columns = list(header[:width])
+
+        chunk, positions = [], []
+        for position, row in enumerate(rows):
+            if position < start:
+                continue
+            if stop is not None and position >= stop:
+                break
+            row = row[:width]
+            if all(value is None for value in row):
+                # Blank rows, often left below the data by spreadsheet edits
+                continue
+            chunk.append(row)
+            positions.append(position)
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=columns, index=positions)
+                chunk, positions = [], []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns, index=positions)
+    finally:
+        workbook.close()
+
+
+def _csv_records(f):
+    """Records of an open CSV file, skipping blank lines as pd.read_csv does"""
+    for record in csv.reader(f):
+        if len(record) > 1 or (record and record[0].strip()):
+            yield record
+
+
+def _iter_csv(file_path, chunk_size, start, stop):
+    nrows = None if stop is None else max(stop - start, 0)
+    # Parse the header as pandas does, renaming duplicate columns
+    columns = list(pd.read_csv(file_path, nrows=0).columns)
+    with open(file_path, newline='') as f:
+        # Step over the header and the first ``start`` rows one record at a
+        # time, so a chunk deep in the file needs no more memory than the first
+        for _ in itertools.islice(_csv_records(f), start + 1):
+            pass
+        reader = pd.read_csv(f, header=None, names=columns, chunksize=chunk_size, nrows=nrows)
+        with reader:
+            first_index = start
+            for chunk in reader:
+                chunk.index = pd.RangeIndex(first_index, first_index + len(chunk))
+                first_index += len(chunk)
+                yield chunk
+
+
+def _iter_parquet(file_path, chunk_size, start, stop):
+    parquet_file = pq.ParquetFile(file_path, memory_map=True)
+    metadata = parquet_file.metadata
+    if stop is None:
+        stop = metadata.num_rows
+
+    # Only decode the row groups that overlap [start, stop)
+    row_groups = []
+    first_row = group_start = 0
+    for i in range(metadata.num_row_groups):
+        group_rows = metadata.row_group(i).num_rows
+        if group_start + group_rows > start and group_start < stop:
+            if not row_groups:
+                first_row = group_start
+            row_groups.append(i)
+        group_start += group_rows
+    if not row_groups:
+        return
+
+    position = first_row
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, row_groups=row_groups):
+        frame = batch.to_pandas()
+        frame.index = pd.RangeIndex(position, position + len(frame))
+        position += len(frame)
+        yield frame[(frame.index >= start) & (frame.index < stop)]
+
@@ -47,7 +47,10 @@ class LoanSerializer(serializers.ModelSerializer):
         read_only_fields = ['loan_id']
 
     def get_customer_name(self, obj):
-        return f"{obj.customer.first_name} {obj.customer.last_name}"
+        # Listings of one customer's loans pass the customer in the context
+        # so it is not fetched again for every loan
+        customer = self.context.get('customer') or obj.customer
+        return f"{customer.first_name} {customer.last_name}"
 
 
 class LoanDetailSerializer(serializers.ModelSerializer):
@@ -102,3 +105,26 @@ class LoanCreationSerializer(serializers.Serializer):
         if value <= 0:
             raise serializers.ValidationError("Tenure must be positive")
         return value
+
+
+class BulkCreditScoreSerializer(serializers.Serializer):
+    customer_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=10000
+    )
+
+
+class EmiQuoteSerializer(serializers.Serializer):
+    loan_amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    interest_rates = serializers.ListField(
+        child=serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0),
+        allow_empty=False, max_length=100
+    )
+    tenures = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False, max_length=600
+    )
+
+    def validate_loan_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Loan amount must be positive")
+        return value
@@ -1,8 +1,13 @@
 from decimal import Decimal
+import numpy as np
 from datetime import datetime, date
+from django.db import transaction
 from django.utils import timezone
-from django.db.models import Sum, Q
-from .models import Customer, Loan
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from .cache import CreditScoreCache, invalidate_with_commit
+from .metrics import timed
+from .models import Customer, CustomerCreditProfile, Loan
 
 
 class CreditScoreCalculator:
@@ -13,42 +18,58 @@ class CreditScoreCalculator:
     3. Loan activity in current year
     4. Loan approved volume vs current loan volume
     """
-    
+
     @staticmethod
-    def calculate_credit_score(customer_id):
-        try:
-            customer = Customer.objects.get(customer_id=customer_id)
-        except Customer.DoesNotExist:
-            return 0
-        
-        # Get all loans for this customer
-        loans = Loan.objects.filter(customer=customer)
-        
-        # Check if sum of current loans exceeds approved limit
-        current_loans = loans.filter(
-            start_date__lte=timezone.now().date(),
-            end_date__gte=timezone.now().date()
-        )
-        
-        total_current_loan_amount = sum(
-            loan.remaining_amount for loan in current_loans
+    def loan_aggregates(today=None, prefix='loans__'):
+        """
+        Conditional aggregates over a customer's loans, keyed by annotation
+        name. ``prefix`` is the lookup path from the queried model to Loan.
+        """
+        if today is None:
+            today = timezone.now().date()
+
+        active = Q(**{
+            f'{prefix}start_date__lte': today,
+            f'{prefix}end_date__gte': today,
+        })
+        current_year = Q(**{f'{prefix}start_date__year': today.year})
+
+        remaining_amount = Greatest(
+            F(f'{prefix}loan_amount')
+            - F(f'{prefix}emis_paid_on_time') * F(f'{prefix}monthly_repayment'),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
         )
-        
-        if total_current_loan_amount > customer.approved_limit:
+
+        return {
+            'total_loans': Count(f'{prefix}pk'),
+            'total_emis': Coalesce(Sum(f'{prefix}tenure'), 0),
+            'total_paid_on_time': Coalesce(Sum(f'{prefix}emis_paid_on_time'), 0),
+            'current_year_loans': Count(f'{prefix}pk', filter=current_year),
+            'active_remaining_amount': Coalesce(
+                Sum(remaining_amount, filter=active),
+                Value(Decimal('0')),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+        }
+
+    @staticmethod
+    def score_from_aggregates(approved_limit, total_loans, total_emis,
+                              total_paid_on_time, current_year_loans,
+                              active_remaining_amount):
+        """
+        Apply the scoring rules to pre-aggregated loan figures
+        """
+        if active_remaining_amount > approved_limit:
             return 0
-        
+
         score = 0
-        
+
         # 1. Past loans paid on time (40% weight)
-        total_loans = loans.count()
-        if total_loans > 0:
-            total_emis = sum(loan.tenure for loan in loans)
-            total_paid_on_time = sum(loan.emis_paid_on_time for loan in loans)
-            
-            if total_emis > 0:
-                on_time_ratio = total_paid_on_time / total_emis
-                score += on_time_ratio * 40
-        
+        if total_loans > 0 and total_emis > 0:
+            on_time_ratio = total_paid_on_time / total_emis
+            score += on_time_ratio * 40
+
         # 2. Number of loans taken in past (20% weight)
         if total_loans <= 2:
             score += 20
@@ -58,11 +79,8 @@ class CreditScoreCalculator:
             score += 10
         else:
             score += 5
-        
+
         # 3. Loan activity in current year (20% weight)
-        current_year = timezone.now().year
-        current_year_loans = loans.filter(start_date__year=current_year).count()
-        
         if current_year_loans == 0:
             score += 20
         elif current_year_loans <= 2:
@@ -71,10 +89,10 @@ class CreditScoreCalculator:
             score += 10
         else:
             score += 5
-        
+
         # 4. Loan approved volume vs current loan volume (20% weight)
-        if float(customer.approved_limit) > 0:
-            volume_ratio = float(total_current_loan_amount) / float(customer.approved_limit)
+        if float(approved_limit) > 0:
+            volume_ratio = float(active_remaining_amount) / float(approved_limit)
             if volume_ratio <= 0.3:
                 score += 20
             elif volume_ratio <= 0.5:
@@ -83,9 +101,268 @@ class CreditScoreCalculator:
                 score += 10
             else:
                 score += 5
-        
+
         return min(100, max(0, score))
 
+    @staticmethod
+    @timed('scoring_duration_seconds', operation='calculate_credit_score')
+    def calculate_credit_score(customer_id):
+        """
+        Score a single customer with one aggregated query over their loans
+        """
+        aggregates = CreditScoreCalculator.loan_aggregates()
+        row = (
+            Customer.objects
+            .filter(customer_id=customer_id)
+            .annotate(**aggregates)
+            .values('approved_limit', *aggregates)
+            .first()
+        )
+        if row is None:
+            return 0
+
+        return CreditScoreCalculator.score_from_aggregates(**row)
+
+    @staticmethod
+    def get_credit_score(customer_id):
+        """
+        Cached calculate_credit_score, valid for the rest of the day
+        """
+        return CreditScoreCache.get_or_compute(
+            customer_id,
+            lambda: CreditScoreCalculator.calculate_credit_score(customer_id)
+        )
+
+    @staticmethod
+    @timed('scoring_duration_seconds', operation='calculate_credit_scores')
+    def calculate_credit_scores(customer_ids, chunk_size=1000):
+        """
+        Score many customers with one grouped query per chunk of IDs.
+        Yields (customer_id, score) in input order; score is None for
+        unknown customers.
+        """
+        aggregates = CreditScoreCalculator.loan_aggregates()
+        customer_ids = list(dict.fromkeys(customer_ids))
+
+        for start in range(0, len(customer_ids), chunk_size):
+            chunk = customer_ids[start:start + chunk_size]
+            rows = {
+                row.pop('customer_id'): row
+                for row in Customer.objects
+                .filter(customer_id__in=chunk)
+                .annotate(**aggregates)
+                .values('customer_id', 'approved_limit', *aggregates)
+            }
+            for customer_id in chunk:
+                row = rows.get(customer_id)
+                if row is None:
+                    yield customer_id, None
+                else:
+                    yield customer_id, CreditScoreCalculator.score_from_aggregates(**row)
+
+
+class CreditProfileService:
+    """
+    Maintain CustomerCreditProfile rows so eligibility checks read one row
+    instead of re-aggregating the customer's loans
+    """
+
+    PROFILE_FIELDS = [
+        'total_loans', 'total_emis', 'total_paid_on_time', 'current_year_loans',
+        'active_remaining_amount', 'active_monthly_repayment', 'emi_headroom',
+        'as_of', 'updated_at',
+    ]
+
+    @staticmethod
+    def profile_aggregates(today, prefix='loans__'):
+        """
+        loan_aggregates plus the EMI total of the customer's active loans
+        """
+        aggregates = CreditScoreCalculator.loan_aggregates(today, prefix)
+        aggregates['active_monthly_repayment'] = Coalesce(
+            Sum(f'{prefix}monthly_repayment', filter=Q(**{
+                f'{prefix}start_date__lte': today,
+                f'{prefix}end_date__gte': today,
+            })),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        )
+        return aggregates
+
+    @staticmethod
+    def build_profile(customer_id, monthly_salary, row, today):
+        """
+        Unsaved profile from one row of profile_aggregates
+        """
+        return CustomerCreditProfile(
+            customer_id=customer_id,
+            total_loans=row['total_loans'],
+            total_emis=row['total_emis'],
+            total_paid_on_time=row['total_paid_on_time'],
+            current_year_loans=row['current_year_loans'],
+            active_remaining_amount=row['active_remaining_amount'],
+            active_monthly_repayment=row['active_monthly_repayment'],
+            emi_headroom=monthly_salary * Decimal('0.5') - row['active_monthly_repayment'],
+            as_of=today,
+        )
+
+    @staticmethod
+    def refresh(customer_ids=None, today=None, chunk_size=1000):
+        """
+        Rebuild profiles from the loans table with one grouped query and one
+        upsert per chunk. Rebuilds every customer when ``customer_ids`` is None.
+        Returns the number of profiles written.
+        """
+        if today is None:
+            today = timezone.now().date()
+
+        aggregates = CreditProfileService.profile_aggregates(today)
+
+        if customer_ids is None:
+            customer_ids = Customer.objects.order_by('customer_id').values_list(
+                'customer_id', flat=True
+            )
+        customer_ids = list(customer_ids)
+
+        written = 0
+        for start in range(0, len(customer_ids), chunk_size):
+            rows = (
+                Customer.objects
+                .filter(customer_id__in=customer_ids[start:start + chunk_size])
+                .annotate(**aggregates)
+                .values('customer_id', 'monthly_salary', *aggregates)
+            )
+            profiles = [
+                CreditProfileService.build_profile(
+                    row['customer_id'], row['monthly_salary'], row, today
+                )
+                for row in rows
+            ]
+            CustomerCreditProfile.objects.bulk_create(
+                profiles,
+                update_conflicts=True,
+                unique_fields=['customer'],
+                update_fields=CreditProfileService.PROFILE_FIELDS,
+            )
+            invalidate_with_commit(
+                CreditScoreCache.invalidate, [profile.customer_id for profile in profiles]
+            )
+            written += len(profiles)
+
+        return written
+
+    @staticmethod
+    def get_profile(customer_id):
+        """
+        Return the customer's profile with the customer preloaded, rebuilding
+        it first if it is missing or was computed on an earlier day
+        """
+        return CreditProfileService.get_profiles([customer_id]).get(customer_id)
+
+    @staticmethod
+    def get_profiles(customer_ids):
+        """
+        Bulk get_profile: map of customer_id to profile for the customers that
+        exist. Costs one query when every profile is current.
+        """
+        today = timezone.now().date()
+        customer_ids = set(customer_ids)
+        profiles = CustomerCreditProfile.objects.select_related('customer')
+        found = {
+            profile.customer_id: profile
+            for profile in profiles.filter(customer_id__in=customer_ids)
+            if profile.as_of == today
+        }
+
+        stale_ids = customer_ids - found.keys()
+        if stale_ids and CreditProfileService.refresh(stale_ids, today):
+            found.update(
+                (profile.customer_id, profile)
+                for profile in profiles.filter(customer_id__in=stale_ids)
+            )
+        return found
+
+    @staticmethod
+    async def aget_profile(customer_id):
+        """
+        Async get_profile for the ASGI views. A missing or stale profile is
+        computed in memory from one aaggregate() over the customer's loans
+        instead of being written back; the next sync read persists it.
+        """
+        today = timezone.now().date()
+        try:
+            profile = await CustomerCreditProfile.objects.select_related('customer').aget(
+                customer_id=customer_id
+            )
+        except CustomerCreditProfile.DoesNotExist:
+            try:
+                customer = await Customer.objects.aget(customer_id=customer_id)
+            except Customer.DoesNotExist:
+                return None
+        else:
+            if profile.as_of == today:
+                return profile
+            customer = profile.customer
+
+        row = await Loan.objects.filter(customer_id=customer_id).aaggregate(
+            **CreditProfileService.profile_aggregates(today, prefix='')
+        )
+        profile = CreditProfileService.build_profile(
+            customer_id, customer.monthly_salary, row, today
+        )
+        profile.customer = customer
+        return profile
+
+    @staticmethod
+    def mark_stale(customer_ids):
+        """
+        Drop the customers' profiles so the next get_profile rebuilds them
+        """
+        CustomerCreditProfile.objects.filter(customer_id__in=list(customer_ids)).delete()
+
+    @staticmethod
+    def record_new_loan(loan):
+        """
+        Apply a freshly created loan to its customer's profile in place
+        """
+        today = timezone.now().date()
+        cents = Decimal('0.01')
+        loan_amount = Decimal(str(loan.loan_amount)).quantize(cents)
+        monthly_repayment = Decimal(str(loan.monthly_repayment)).quantize(cents)
+        remaining_amount = max(Decimal('0'), loan_amount - loan.emis_paid_on_time * monthly_repayment)
+
+        if not loan.start_date <= today <= loan.end_date:
+            remaining_amount = monthly_repayment = Decimal('0')
+
+        updated = CustomerCreditProfile.objects.filter(
+            customer_id=loan.customer_id, as_of=today
+        ).update(
+            total_loans=F('total_loans') + 1,
+            total_emis=F('total_emis') + loan.tenure,
+            total_paid_on_time=F('total_paid_on_time') + loan.emis_paid_on_time,
+            current_year_loans=F('current_year_loans') + int(loan.start_date.year == today.year),
+            active_remaining_amount=F('active_remaining_amount') + remaining_amount,
+            active_monthly_repayment=F('active_monthly_repayment') + monthly_repayment,
+            emi_headroom=F('emi_headroom') - monthly_repayment,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            CreditProfileService.refresh([loan.customer_id], today)
+
+    @staticmethod
+    def credit_score(profile):
+        """
+        Credit score from a profile loaded with its customer
+        """
+        return CreditScoreCalculator.score_from_aggregates(
+            approved_limit=profile.customer.approved_limit,
+            total_loans=profile.total_loans,
+            total_emis=profile.total_emis,
+            total_paid_on_time=profile.total_paid_on_time,
+            current_year_loans=profile.current_year_loans,
+            active_remaining_amount=profile.active_remaining_amount,
+        )
+
 
 class LoanEligibilityService:
     """
@@ -108,6 +385,23 @@ class LoanEligibilityService:
         emi = principal * monthly_rate * (1 + monthly_rate) ** tenure / ((1 + monthly_rate) ** tenure - 1)
         return round(emi, 2)
     
+    @staticmethod
+    def calculate_monthly_emis(loan_amounts, interest_rates, tenures):
+        """
+        Vectorized calculate_monthly_emi. Inputs broadcast against each
+        other like NumPy arrays, so a column of rates and a row of tenures
+        yields a full rate x tenure grid. Results match the scalar version
+        exactly, including the unrounded zero-rate branch.
+        """
+        principal = np.asarray(loan_amounts, dtype=np.float64)
+        monthly_rate = np.asarray(interest_rates, dtype=np.float64) / 100 / 12
+        tenure = np.asarray(tenures, dtype=np.float64)
+
+        growth = (1 + monthly_rate) ** tenure
+        with np.errstate(divide='ignore', invalid='ignore'):
+            emi = np.round(principal * monthly_rate * growth / (growth - 1), 2)
+        return np.where(monthly_rate == 0, principal / tenure, emi)
+    
     @staticmethod
     def get_corrected_interest_rate(credit_score):
         """
@@ -123,21 +417,82 @@ class LoanEligibilityService:
             return None  # Not eligible
     
     @staticmethod
+    @timed('scoring_duration_seconds', operation='check_eligibility')
     def check_eligibility(customer_id, loan_amount, interest_rate, tenure):
         """
         Check loan eligibility and return detailed response
         """
-        try:
-            customer = Customer.objects.get(customer_id=customer_id)
-        except Customer.DoesNotExist:
-            return {
-                'customer_id': customer_id,
-                'approval': False,
-                'message': 'Customer not found'
-            }
+        profile = CreditProfileService.get_profile(customer_id)
+        if profile is None:
+            return LoanEligibilityService._customer_not_found(customer_id)
         
         # Calculate credit score
-        credit_score = CreditScoreCalculator.calculate_credit_score(customer_id)
+        credit_score = CreditScoreCache.get_or_compute(
+            customer_id, lambda: CreditProfileService.credit_score(profile)
+        )
+        
+        return LoanEligibilityService.evaluate_application(
+            profile, credit_score, loan_amount, interest_rate, tenure
+        )
+    
+    @staticmethod
+    @timed('scoring_duration_seconds', operation='check_eligibility')
+    async def acheck_eligibility(customer_id, loan_amount, interest_rate, tenure):
+        """
+        check_eligibility for async views, without blocking the event loop
+        """
+        profile = await CreditProfileService.aget_profile(customer_id)
+        if profile is None:
+            return LoanEligibilityService._customer_not_found(customer_id)
+
+        credit_score = await CreditScoreCache.aget_or_compute(
+            customer_id, lambda: CreditProfileService.credit_score(profile)
+        )
+
+        return LoanEligibilityService.evaluate_application(
+            profile, credit_score, loan_amount, interest_rate, tenure
+        )
+    
+    @staticmethod
+    @timed('scoring_duration_seconds', operation='check_eligibility_bulk')
+    def check_eligibility_bulk(applications):
+        """
+        Check many applications, possibly several per customer, loading each
+        involved customer's profile once. ``applications`` are dicts with
+        customer_id, loan_amount, interest_rate and tenure; results are
+        returned in the same order.
+        """
+        profiles = CreditProfileService.get_profiles(
+            application['customer_id'] for application in applications
+        )
+        
+        credit_scores = {}
+        results = []
+        for application in applications:
+            customer_id = application['customer_id']
+            profile = profiles.get(customer_id)
+            if profile is None:
+                results.append(LoanEligibilityService._customer_not_found(customer_id))
+                continue
+            
+            if customer_id not in credit_scores:
+                credit_scores[customer_id] = CreditProfileService.credit_score(profile)
+            
+            results.append(LoanEligibilityService.evaluate_application(
+                profile,
+                credit_scores[customer_id],
+                application['loan_amount'],
+                application['interest_rate'],
+                application['tenure'],
+            ))
+        return results
+    
+    @staticmethod
+    def evaluate_application(profile, credit_score, loan_amount, interest_rate, tenure):
+        """
+        Decide a single application against an already loaded profile
+        """
+        customer_id = profile.customer_id
         
         # Get corrected interest rate
         corrected_interest_rate = LoanEligibilityService.get_corrected_interest_rate(credit_score)
@@ -159,20 +514,8 @@ class LoanEligibilityService:
             loan_amount, final_interest_rate, tenure
         )
         
-        # Check if EMI exceeds 50% of monthly income
-        max_allowed_emi = float(customer.monthly_salary) * 0.5
-        
-        # Get current EMIs
-        current_loans = Loan.objects.filter(
-            customer=customer,
-            start_date__lte=timezone.now().date(),
-            end_date__gte=timezone.now().date()
-        )
-        current_emis = sum(float(loan.monthly_repayment) for loan in current_loans)
-        
-        total_emis_after_loan = current_emis + monthly_emi
-        
-        approval = total_emis_after_loan <= max_allowed_emi
+        # Check if EMIs after this loan stay within 50% of monthly income
+        approval = monthly_emi <= float(profile.emi_headroom)
         
         return {
             'customer_id': customer_id,
@@ -185,52 +528,70 @@ class LoanEligibilityService:
         }
     
     @staticmethod
+    def _customer_not_found(customer_id):
+        return {
+            'customer_id': customer_id,
+            'approval': False,
+            'message': 'Customer not found'
+        }
+    
+    @staticmethod
+    @timed('scoring_duration_seconds', operation='create_loan')
     def create_loan(customer_id, loan_amount, interest_rate, tenure):
         """
-        Create a loan if eligible
+        Create a loan if eligible. The eligibility check, the insert and the
+        debt update share one transaction holding the customer's row lock, so
+        concurrent requests for one customer are decided one after another
+        against the committed loans, while other customers proceed in parallel.
         """
-        eligibility = LoanEligibilityService.check_eligibility(
-            customer_id, loan_amount, interest_rate, tenure
-        )
-        
-        if not eligibility['approval']:
-            return {
-                'loan_id': None,
-                'customer_id': customer_id,
-                'loan_approved': False,
-                'message': eligibility['message'],
-                'monthly_installment': eligibility['monthly_installment']
-            }
-        
         try:
-            customer = Customer.objects.get(customer_id=customer_id)
-            
-            # Use corrected interest rate
-            final_interest_rate = eligibility['corrected_interest_rate']
-            monthly_emi = eligibility['monthly_installment']
-            
-            # Calculate loan dates
-            start_date = timezone.now().date()
-            end_date = date(
-                start_date.year + (start_date.month + tenure - 1) // 12,
-                (start_date.month + tenure - 1) % 12 + 1,
-                start_date.day
-            )
-            
-            # Create loan
-            loan = Loan.objects.create(
-                customer=customer,
-                loan_amount=loan_amount,
-                tenure=tenure,
-                interest_rate=final_interest_rate,
-                monthly_repayment=monthly_emi,
-                start_date=start_date,
-                end_date=end_date
-            )
-            
-            # Update customer's current debt
-            customer.current_debt += loan_amount
-            customer.save()
+            with transaction.atomic():
+                customer = (
+                    Customer.objects.select_for_update()
+                    .filter(customer_id=customer_id).first()
+                )
+                if customer is None:
+                    return LoanEligibilityService._loan_rejected(
+                        customer_id, 'Customer not found', 0
+                    )
+
+                eligibility = LoanEligibilityService.check_eligibility(
+                    customer_id, loan_amount, interest_rate, tenure
+                )
+                if not eligibility['approval']:
+                    return LoanEligibilityService._loan_rejected(
+                        customer_id, eligibility['message'], eligibility['monthly_installment']
+                    )
+
+                # Use corrected interest rate
+                final_interest_rate = eligibility['corrected_interest_rate']
+                monthly_emi = eligibility['monthly_installment']
+                
+                # Calculate loan dates
+                start_date = timezone.now().date()
+                end_date = date(
+                    start_date.year + (start_date.month + tenure - 1) // 12,
+                    (start_date.month + tenure - 1) % 12 + 1,
+                    start_date.day
+                )
+                
+                # Create loan
+                loan = Loan.objects.create(
+                    customer=customer,
+                    loan_amount=loan_amount,
+                    tenure=tenure,
+                    interest_rate=final_interest_rate,
+                    monthly_repayment=monthly_emi,
+                    start_date=start_date,
+                    end_date=end_date
+                )
+                
+                # Update customer's current debt in SQL; save() still bumps
+                # updated_at and fires the cache invalidation signal
+                customer.current_debt = F('current_debt') + loan_amount
+                customer.save(update_fields=['current_debt', 'updated_at'])
+                # The Loan post_save signal has already applied the loan to
+                # the customer's credit profile
             
             return {
                 'loan_id': loan.loan_id,
@@ -241,10 +602,16 @@ class LoanEligibilityService:
             }
             
         except Exception as e:
-            return {
-                'loan_id': None,
-                'customer_id': customer_id,
-                'loan_approved': False,
-                'message': f'Error creating loan: {str(e)}',
-                'monthly_installment': 0
-            }
+            return LoanEligibilityService._loan_rejected(
+                customer_id, f'Error creating loan: {str(e)}', 0
+            )
+
+    @staticmethod
+    def _loan_rejected(customer_id, message, monthly_installment):
+        return {
+            'loan_id': None,
+            'customer_id': customer_id,
+            'loan_approved': False,
+            'message': message,
+            'monthly_installment': monthly_installment
+        }
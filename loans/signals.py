@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import CreditScoreCache, LoanResponseCache, invalidate_with_commit
+from .models import Customer, Loan
+from .services import CreditProfileService
+
+# Customer fields the credit profile is derived from
+PROFILE_CUSTOMER_FIELDS = {'monthly_salary'}
+
+
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+def invalidate_loan_caches(sender, instance, created=False, **kwargs):
+    # A new loan is added to a current profile in place; an edited or
+    # deleted one cannot be subtracted reliably, so the profile is rebuilt
+    # on its next read
+    if created:
+        CreditProfileService.record_new_loan(instance)
+    else:
+        CreditProfileService.mark_stale([instance.customer_id])
+    invalidate_with_commit(CreditScoreCache.invalidate, [instance.customer_id])
+    if LoanResponseCache.enabled():
+        invalidate_with_commit(LoanResponseCache.invalidate, [instance.loan_id])
+
+
+@receiver(post_save, sender=Customer)
+def invalidate_customer_caches(sender, instance, created=False, update_fields=None, **kwargs):
+    if not created and (update_fields is None or PROFILE_CUSTOMER_FIELDS & set(update_fields)):
+        CreditProfileService.mark_stale([instance.customer_id])
+    invalidate_with_commit(CreditScoreCache.invalidate, [instance.customer_id])
+    if LoanResponseCache.enabled():
+        # Loan responses embed the customer
+        loan_ids = list(instance.loans.values_list('loan_id', flat=True))
+        invalidate_with_commit(LoanResponseCache.invalidate, loan_ids)
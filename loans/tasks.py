@@ -1,64 +1,50 @@
-from celery import shared_task
-import pandas as pd
+from celery import chord, group, shared_task
 import os
+from decimal import Decimal
 from django.conf import settings
+from django.db import transaction
 from .models import Customer, Loan
-from datetime import datetime
+from .services import CreditProfileService, LoanEligibilityService
+from .ingestion import (
+    columnar_source, copy_customers, copy_loans, file_unchanged, ingest_file,
+    merge_reports, record_manifest, reset_sequences, unchanged_file_result,
+    upsert_customers, upsert_loans
+)
+from .readers import count_rows, file_checksum, read_frame
 
 
 @shared_task
-def ingest_customer_data(file_path=None):
+def ingest_customer_data(file_path=None, batch_size=None, force=False, resume=False):
     """
-    Celery task to ingest customer data from Excel file
+    Celery task to ingest customer data from an Excel, CSV or Parquet file.
+    A file identical to the last one ingested is skipped, and only new or
+    changed rows are written; ``force`` rewrites every row. ``resume``
+    continues an interrupted run of the same file from its checkpoint.
     """
     if not file_path:
         file_path = os.path.join(settings.BASE_DIR, 'customer_data.xlsx')
+    if not batch_size:
+        batch_size = settings.INGESTION_BATCH_SIZE
     
     try:
-        # Read Excel file
-        df = pd.read_excel(file_path)
+        checksum = file_checksum(file_path)
+        if not force and file_unchanged('customers', checksum):
+            return unchanged_file_result('customers')
         
-        customers_created = 0
-        customers_updated = 0
-        
-        for _, row in df.iterrows():
-            try:
-                customer, created = Customer.objects.get_or_create(
-                    customer_id=row.get('Customer ID', row.get('customer_id')),
-                    defaults={
-                        'first_name': row.get('First Name', row.get('first_name', '')),
-                        'last_name': row.get('Last Name', row.get('last_name', '')),
-                        'age': int(row.get('Age', row.get('age', 0))),
-                        'phone_number': str(row.get('Phone Number', row.get('phone_number', ''))),
-                        'monthly_salary': float(row.get('Monthly Salary', row.get('monthly_salary', 0))),
-                        'approved_limit': float(row.get('Approved Limit', row.get('approved_limit', 0))),
-                        'current_debt': float(row.get('Current Debt', row.get('current_debt', 0))),
-                    }
-                )
-                
-                if created:
-                    customers_created += 1
-                else:
-                    # Update existing customer
-                    customer.first_name = row.get('First Name', row.get('first_name', customer.first_name))
-                    customer.last_name = row.get('Last Name', row.get('last_name', customer.last_name))
-                    customer.age = int(row.get('Age', row.get('age', customer.age)))
-                    customer.phone_number = str(row.get('Phone Number', row.get('phone_number', customer.phone_number)))
-                    customer.monthly_salary = float(row.get('Monthly Salary', row.get('monthly_salary', customer.monthly_salary)))
-                    customer.approved_limit = float(row.get('Approved Limit', row.get('approved_limit', customer.approved_limit)))
-                    customer.current_debt = float(row.get('Current Debt', row.get('current_debt', customer.current_debt)))
-                    customer.save()
-                    customers_updated += 1
-                    
-            except Exception as e:
-                print(f"Error processing customer row: {e}")
-                continue
+        # Salary and limit changes move the EMI headroom of existing
+        # profiles, so each batch's profiles are refreshed as it is written
+        report, total = ingest_file(
+            upsert_customers, 'customers', file_path, batch_size,
+            force=force, checksum=checksum, resume=resume
+        )
+        reset_sequences(Customer)
+        if not report.failed:
+            record_manifest('customers', file_path, checksum, total)
         
         return {
             'status': 'success',
-            'customers_created': customers_created,
-            'customers_updated': customers_updated,
-            'total_processed': len(df)
+            **report.as_dict(),
+            'total_processed': total
         }
         
     except Exception as e:
@@ -69,77 +55,34 @@ def ingest_customer_data(file_path=None):
 
 
 @shared_task
-def ingest_loan_data(file_path=None):
+def ingest_loan_data(file_path=None, batch_size=None, force=False, resume=False):
     """
-    Celery task to ingest loan data from Excel file
+    Celery task to ingest loan data from an Excel, CSV or Parquet file.
+    Unchanged files and rows are skipped, and interrupted runs resumed, as
+    for ingest_customer_data.
     """
     if not file_path:
         file_path = os.path.join(settings.BASE_DIR, 'loan_data.xlsx')
+    if not batch_size:
+        batch_size = settings.INGESTION_BATCH_SIZE
     
     try:
-        # Read Excel file
-        df = pd.read_excel(file_path)
-        
-        loans_created = 0
-        loans_updated = 0
+        checksum = file_checksum(file_path)
+        if not force and file_unchanged('loans', checksum):
+            return unchanged_file_result('loans')
         
-        for _, row in df.iterrows():
-            try:
-                # Get customer
-                customer_id = row.get('Customer ID', row.get('customer_id'))
-                try:
-                    customer = Customer.objects.get(customer_id=customer_id)
-                except Customer.DoesNotExist:
-                    print(f"Customer {customer_id} not found, skipping loan")
-                    continue
-                
-                # Parse dates
-                start_date = row.get('Date of Approval', row.get('start_date'))
-                end_date = row.get('End Date', row.get('end_date'))
-                
-                if isinstance(start_date, str):
-                    start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                if isinstance(end_date, str):
-                    end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                
-                loan, created = Loan.objects.get_or_create(
-                    loan_id=row.get('Loan ID', row.get('loan_id')),
-                    defaults={
-                        'customer': customer,
-                        'loan_amount': float(row.get('Principal', row.get('loan_amount', 0))),
-                        'tenure': int(row.get('Tenure', row.get('tenure', 0))),
-                        'interest_rate': float(row.get('Interest Rate', row.get('interest_rate', 0))),
-                        'monthly_repayment': float(row.get('Monthly payment', row.get('monthly_repayment', 0))),
-                        'emis_paid_on_time': int(row.get('EMIs paid on Time', row.get('emis_paid_on_time', 0))),
-                        'start_date': start_date,
-                        'end_date': end_date,
-                    }
-                )
-                
-                if created:
-                    loans_created += 1
-                else:
-                    # Update existing loan
-                    loan.customer = customer
-                    loan.loan_amount = float(row.get('Principal', row.get('loan_amount', loan.loan_amount)))
-                    loan.tenure = int(row.get('Tenure', row.get('tenure', loan.tenure)))
-                    loan.interest_rate = float(row.get('Interest Rate', row.get('interest_rate', loan.interest_rate)))
-                    loan.monthly_repayment = float(row.get('Monthly payment', row.get('monthly_repayment', loan.monthly_repayment)))
-                    loan.emis_paid_on_time = int(row.get('EMIs paid on Time', row.get('emis_paid_on_time', loan.emis_paid_on_time)))
-                    loan.start_date = start_date
-                    loan.end_date = end_date
-                    loan.save()
-                    loans_updated += 1
-                    
-            except Exception as e:
-                print(f"Error processing loan row: {e}")
-                continue
+        report, total = ingest_file(
+            upsert_loans, 'loans', file_path, batch_size,
+            force=force, checksum=checksum, resume=resume
+        )
+        reset_sequences(Loan)
+        if not report.failed:
+            record_manifest('loans', file_path, checksum, total)
         
         return {
             'status': 'success',
-            'loans_created': loans_created,
-            'loans_updated': loans_updated,
-            'total_processed': len(df)
+            **report.as_dict(),
+            'total_processed': total
         }
         
     except Exception as e:
@@ -150,14 +93,203 @@ def ingest_loan_data(file_path=None):
 
 
 @shared_task
-def ingest_all_data():
+def ingest_all_data(force=False, resume=False):
     """
     Celery task to ingest both customer and loan data
     """
-    customer_result = ingest_customer_data()
-    loan_result = ingest_loan_data()
+    customer_result = ingest_customer_data(force=force, resume=resume)
+    loan_result = ingest_loan_data(force=force, resume=resume)
     
     return {
         'customer_ingestion': customer_result,
         'loan_ingestion': loan_result
     }
+
+
+@shared_task(bind=True)
+def ingest_all_data_parallel(self, customer_file_path=None, loan_file_path=None,
+                             chunk_rows=None, force=False, resume=False):
+    """
+    Celery task to ingest both files across the worker pool. Each file is
+    split into row ranges that run as a group; the loan chunks start only
+    after every customer chunk has finished. The task's result is the same
+    summary as ingest_all_data.
+    
+    Nothing is dispatched when both files match the manifest, and with
+    ``resume`` each chunk picks up its own interrupted run. Rows repeated
+    in different chunks are applied in completion order, not file order.
+    """
+    if not customer_file_path:
+        customer_file_path = os.path.join(settings.BASE_DIR, 'customer_data.xlsx')
+    if not loan_file_path:
+        loan_file_path = os.path.join(settings.BASE_DIR, 'loan_data.xlsx')
+    if not chunk_rows:
+        chunk_rows = settings.INGESTION_CHUNK_ROWS
+    
+    manifest = {
+        'customers': [customer_file_path, file_checksum(customer_file_path)],
+        'loans': [loan_file_path, file_checksum(loan_file_path)],
+    }
+    if not force and all(
+        file_unchanged(kind, checksum) for kind, (_, checksum) in manifest.items()
+    ):
+        return {
+            'customer_ingestion': unchanged_file_result('customers'),
+            'loan_ingestion': unchanged_file_result('loans')
+        }
+    
+    return self.replace(chord(
+        _chunk_group(ingest_customer_chunk, customer_file_path, chunk_rows,
+                     manifest['customers'][1], force, resume),
+        start_loan_ingestion.s(loan_file_path, chunk_rows, manifest, force, resume)
+    ))
+
+
+@shared_task(bind=True)
+def start_loan_ingestion(self, customer_results, loan_file_path, chunk_rows, manifest,
+                         force=False, resume=False):
+    """
+    Chord callback run once all customer chunks are done: fan out the loan
+    chunks, then merge everything
+    """
+    return self.replace(chord(
+        _chunk_group(ingest_loan_chunk, loan_file_path, chunk_rows,
+                     manifest['loans'][1], force, resume),
+        finish_parallel_ingestion.s(customer_results, manifest)
+    ))
+
+
+@shared_task
+def ingest_customer_chunk(file_path, start, stop, batch_size=None, force=False,
+                          checksum=None, resume=False):
+    """
+    Celery task to upsert customer rows [start, stop) of a file
+    """
+    try:
+        report, total = ingest_file(
+            upsert_customers, 'customers', file_path, batch_size or settings.INGESTION_BATCH_SIZE,
+            start, stop, refresh_profiles=False, force=force, checksum=checksum, resume=resume
+        )
+        return {'status': 'success', **report.as_dict(), 'total_processed': total}
+    except Exception as e:
+        return {'status': 'error', 'message': str(e)}
+
+
+@shared_task
+def ingest_loan_chunk(file_path, start, stop, batch_size=None, force=False,
+                      checksum=None, resume=False):
+    """
+    Celery task to upsert loan rows [start, stop) of a file
+    """
+    try:
+        report, total = ingest_file(
+            upsert_loans, 'loans', file_path, batch_size or settings.INGESTION_BATCH_SIZE,
+            start, stop, refresh_profiles=False, force=force, checksum=checksum, resume=resume
+        )
+        return {'status': 'success', **report.as_dict(), 'total_processed': total}
+    except Exception as e:
+        return {'status': 'error', 'message': str(e)}
+
+
+@shared_task
+def finish_parallel_ingestion(loan_results, customer_results, manifest=None):
+    """
+    Final chord callback: merge chunk results, then do the once-per-run work
+    the chunks skip
+    """
+    reset_sequences(Customer, Loan)
+    # Chunks finish in any order, so profiles are rebuilt once at the end
+    CreditProfileService.refresh()
+    
+    results = {
+        'customer_ingestion': merge_reports('customers', customer_results),
+        'loan_ingestion': merge_reports('loans', loan_results)
+    }
+    for kind, result in zip(('customers', 'loans'), results.values()):
+        if manifest and result['status'] == 'success' and not result['rows_failed']:
+            file_path, checksum = manifest[kind]
+            record_manifest(kind, file_path, checksum, result['total_processed'])
+    return results
+
+
+def _chunk_group(task, file_path, chunk_rows, checksum, force=False, resume=False):
+    """Group of ``task`` signatures covering the file in row ranges"""
+    # Converting here, once, also spares every chunk task the workbook parse
+    total = count_rows(columnar_source(file_path, checksum))
+    return group(
+        task.s(file_path, start, min(start + chunk_rows, total),
+               force=force, checksum=checksum, resume=resume)
+        for start in range(0, max(total, 1), chunk_rows)
+    )
+
+
+@shared_task
+def copy_all_data(customer_file_path=None, loan_file_path=None):
+    """
+    Celery task to bulk load both files into empty tables with PostgreSQL
+    COPY. Returns the same summary as ingest_all_data.
+    """
+    if not customer_file_path:
+        customer_file_path = os.path.join(settings.BASE_DIR, 'customer_data.xlsx')
+    if not loan_file_path:
+        loan_file_path = os.path.join(settings.BASE_DIR, 'loan_data.xlsx')
+    
+    try:
+        # COPY resolves duplicate keys across the whole file, so it still
+        # reads each file in full
+        customer_checksum = file_checksum(customer_file_path)
+        loan_checksum = file_checksum(loan_file_path)
+        customers_df = read_frame(columnar_source(customer_file_path, customer_checksum))
+        loans_df = read_frame(columnar_source(loan_file_path, loan_checksum))
+        
+        with transaction.atomic():
+            if Customer.objects.exists() or Loan.objects.exists():
+                raise ValueError("COPY loading requires empty customer and loan tables")
+            
+            customer_report = copy_customers(customers_df)
+            loan_report = copy_loans(loans_df)
+            reset_sequences(Customer, Loan)
+            CreditProfileService.refresh()
+            
+            # Rows carry their source hashes, so later daily loads are deltas
+            for kind, file_path, checksum, report, total in (
+                ('customers', customer_file_path, customer_checksum, customer_report, len(customers_df)),
+                ('loans', loan_file_path, loan_checksum, loan_report, len(loans_df)),
+            ):
+                if not report.failed:
+                    record_manifest(kind, file_path, checksum, total)
+        
+        return {
+            'customer_ingestion': {
+                'status': 'success',
+                **customer_report.as_dict(),
+                'total_processed': len(customers_df)
+            },
+            'loan_ingestion': {
+                'status': 'success',
+                **loan_report.as_dict(),
+                'total_processed': len(loans_df)
+            }
+        }
+        
+    except Exception as e:
+        error = {
+            'status': 'error',
+            'message': str(e)
+        }
+        return {
+            'customer_ingestion': error,
+            'loan_ingestion': error
+        }
+
+
+@shared_task
+def process_loan_application(customer_id, loan_amount, interest_rate, tenure):
+    """
+    Celery task behind POST /api/create-loan/?async=1. Amounts arrive as
+    strings so they survive JSON serialization exactly; the result is the
+    same dict the synchronous endpoint returns.
+    """
+    return LoanEligibilityService.create_loan(
+        customer_id, Decimal(loan_amount), Decimal(interest_rate), tenure
+    )
@@ -1,13 +1,48 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+from io import StringIO
+
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework import status
 from decimal import Decimal
 from datetime import date, timedelta
 from django.utils import timezone
 
-from .models import Customer, Loan
-from .services import CreditScoreCalculator, LoanEligibilityService
+import fakeredis
+import pandas as pd
+import pyarrow.parquet as pq
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.core.management import CommandError, call_command
+
+from asgiref.sync import sync_to_async
+from celery.contrib.testing.worker import start_worker
+
+from credit_approval_system.celery import app as celery_app
+from .cache import CreditScoreCache, IdempotencyCache, LoanResponseCache
+from .ingestion import (
+    CUSTOMER_UPDATE_FIELDS, LOAN_UPDATE_FIELDS, ingest_file, normalize_customers,
+    normalize_loans, upsert_customers
+)
+from .metrics import Metrics
+from .ratelimit import RateLimiter, RateLimitMiddleware
+from .readers import columnar_copy, count_rows, file_checksum, iter_chunks
+from .models import Customer, CustomerCreditProfile, IngestionManifest, IngestionRun, Loan
+from .services import CreditProfileService, CreditScoreCalculator, LoanEligibilityService
+from .tasks import (
+    copy_all_data, ingest_all_data_parallel, ingest_customer_data, ingest_loan_data
+)
 
 
 class CustomerModelTest(TestCase):
@@ -91,6 +126,87 @@ class CreditScoreCalculatorTest(TestCase):
         score = CreditScoreCalculator.calculate_credit_score(self.customer.customer_id)
         self.assertEqual(score, 0)
 
+    def test_credit_score_with_loan_history(self):
+        today = timezone.now().date()
+        # Active loan started this year: remaining 100000 - 2 * 9000 = 82000
+        Loan.objects.create(
+            customer=self.customer,
+            loan_amount=Decimal('100000.00'),
+            tenure=12,
+            interest_rate=Decimal('10.00'),
+            monthly_repayment=Decimal('9000.00'),
+            emis_paid_on_time=2,
+            start_date=today,
+            end_date=today + timedelta(days=365)
+        )
+        # Closed loans from earlier years, one fully repaid
+        for emis_paid_on_time in (12, 6):
+            Loan.objects.create(
+                customer=self.customer,
+                loan_amount=Decimal('50000.00'),
+                tenure=12,
+                interest_rate=Decimal('12.00'),
+                monthly_repayment=Decimal('4500.00'),
+                emis_paid_on_time=emis_paid_on_time,
+                start_date=date(today.year - 3, 1, 1),
+                end_date=date(today.year - 2, 1, 1)
+            )
+
+        score = CreditScoreCalculator.calculate_credit_score(self.customer.customer_id)
+        # On-time 20/36 * 40, 3 loans (15), 1 this year (15), 82000/1800000 (20)
+        self.assertAlmostEqual(score, 20 / 36 * 40 + 15 + 15 + 20)
+
+    def test_credit_score_uses_single_query(self):
+        for i in range(5):
+            Loan.objects.create(
+                customer=self.customer,
+                loan_amount=Decimal('100000.00'),
+                tenure=12,
+                interest_rate=Decimal('10.00'),
+                monthly_repayment=Decimal('8792.00'),
+                emis_paid_on_time=i,
+                start_date=timezone.now().date(),
+                end_date=timezone.now().date() + timedelta(days=365)
+            )
+
+        with self.assertNumQueries(1):
+            CreditScoreCalculator.calculate_credit_score(self.customer.customer_id)
+
+    def test_credit_score_nonexistent_customer(self):
+        self.assertEqual(CreditScoreCalculator.calculate_credit_score(99999), 0)
+
+    def test_batch_credit_scores_match_single_scores(self):
+        other = Customer.objects.create(
+            first_name='Jane',
+            last_name='Roe',
+            age=40,
+            phone_number='9876543210',
+            monthly_salary=Decimal('30000.00'),
+            approved_limit=Decimal('1100000.00')
+        )
+        for customer in (self.customer, other, other):
+            Loan.objects.create(
+                customer=customer,
+                loan_amount=Decimal('100000.00'),
+                tenure=12,
+                interest_rate=Decimal('10.00'),
+                monthly_repayment=Decimal('8792.00'),
+                emis_paid_on_time=3,
+                start_date=timezone.now().date(),
+                end_date=timezone.now().date() + timedelta(days=365)
+            )
+
+        customer_ids = [other.customer_id, 99999, self.customer.customer_id]
+        with self.assertNumQueries(1):
+            scores = list(CreditScoreCalculator.calculate_credit_scores(customer_ids))
+
+        self.assertEqual(scores, [
+            (other.customer_id, CreditScoreCalculator.calculate_credit_score(other.customer_id)),
+            (99999, None),
+            (self.customer.customer_id,
+             CreditScoreCalculator.calculate_credit_score(self.customer.customer_id)),
+        ])
+
 
 class LoanEligibilityServiceTest(TestCase):
     def setUp(self):
@@ -109,6 +225,24 @@ class LoanEligibilityServiceTest(TestCase):
         self.assertGreater(emi, 8000)
         self.assertLess(emi, 9500)
 
+    def test_calculate_monthly_emis_matches_scalar(self):
+        loan_amounts = [100000, 250000.5, 1234567.89]
+        interest_rates = [0, 7.5, 12, 16.25]
+        tenures = [1, 6, 12, 60, 360]
+
+        grid = LoanEligibilityService.calculate_monthly_emis(
+            [[[amount]] for amount in loan_amounts],
+            [[rate] for rate in interest_rates],
+            tenures
+        )
+        for i, amount in enumerate(loan_amounts):
+            for j, rate in enumerate(interest_rates):
+                for k, tenure in enumerate(tenures):
+                    self.assertEqual(
+                        grid[i][j][k],
+                        LoanEligibilityService.calculate_monthly_emi(amount, rate, tenure)
+                    )
+
     def test_get_corrected_interest_rate(self):
         # High credit score
         rate = LoanEligibilityService.get_corrected_interest_rate(80)
@@ -140,6 +274,573 @@ class LoanEligibilityServiceTest(TestCase):
         self.assertIn('EMI', result['message'])
 
 
+class CustomerMixin:
+    """Create the applicant most service and API tests score"""
+
+    def create_customer(self, phone_number='1234567890', **fields):
+        return Customer.objects.create(**{
+            'first_name': 'John',
+            'last_name': 'Doe',
+            'age': 30,
+            'phone_number': phone_number,
+            'monthly_salary': Decimal('50000.00'),
+            'approved_limit': Decimal('1800000.00'),
+            **fields,
+        })
+
+
+class CreditProfileServiceTest(CustomerMixin, TestCase):
+    def setUp(self):
+        self.customer = self.create_customer()
+        Loan.objects.create(
+            customer=self.customer,
+            loan_amount=Decimal('100000.00'),
+            tenure=12,
+            interest_rate=Decimal('10.00'),
+            monthly_repayment=Decimal('8792.00'),
+            emis_paid_on_time=4,
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=365)
+        )
+
+    def profile_values(self):
+        return CustomerCreditProfile.objects.filter(
+            customer=self.customer
+        ).values(*CreditProfileService.PROFILE_FIELDS[:-1]).get()
+
+    def test_profile_matches_loan_aggregates(self):
+        profile = CreditProfileService.get_profile(self.customer.customer_id)
+        self.assertEqual(profile.total_loans, 1)
+        self.assertEqual(profile.total_paid_on_time, 4)
+        self.assertEqual(profile.active_remaining_amount, Decimal('64832.00'))
+        self.assertEqual(profile.emi_headroom, Decimal('16208.00'))
+        self.assertEqual(
+            CreditProfileService.credit_score(profile),
+            CreditScoreCalculator.calculate_credit_score(self.customer.customer_id)
+        )
+
+    def test_create_loan_updates_profile_incrementally(self):
+        CreditProfileService.refresh([self.customer.customer_id])
+        result = LoanEligibilityService.create_loan(self.customer.customer_id, 50000, 12, 12)
+        self.assertTrue(result['loan_approved'])
+
+        incremental = self.profile_values()
+        CreditProfileService.refresh([self.customer.customer_id])
+        self.assertEqual(incremental, self.profile_values())
+
+    def test_check_eligibility_reads_single_row(self):
+        CreditProfileService.refresh([self.customer.customer_id])
+        with self.assertNumQueries(1):
+            LoanEligibilityService.check_eligibility(self.customer.customer_id, 50000, 12, 12)
+
+    def test_loan_and_salary_edits_mark_profile_stale(self):
+        profile = CreditProfileService.get_profile(self.customer.customer_id)
+        self.assertEqual(profile.emi_headroom, Decimal('16208.00'))
+
+        loan = Loan.objects.get()
+        loan.monthly_repayment = Decimal('5000.00')
+        loan.save()
+        profile = CreditProfileService.get_profile(self.customer.customer_id)
+        self.assertEqual(profile.emi_headroom, Decimal('20000.00'))
+
+        self.customer.monthly_salary = Decimal('60000.00')
+        self.customer.save()
+        profile = CreditProfileService.get_profile(self.customer.customer_id)
+        self.assertEqual(profile.emi_headroom, Decimal('25000.00'))
+
+        loan.delete()
+        profile = CreditProfileService.get_profile(self.customer.customer_id)
+        self.assertEqual(profile.total_loans, 0)
+        self.assertEqual(profile.emi_headroom, Decimal('30000.00'))
+
+    def test_rebuild_command_repairs_drift(self):
+        CreditProfileService.refresh([self.customer.customer_id])
+        CustomerCreditProfile.objects.update(total_loans=0, emi_headroom=0)
+
+        call_command('rebuild_credit_profiles', stdout=StringIO())
+        self.assertEqual(self.profile_values()['total_loans'], 1)
+        self.assertEqual(self.profile_values()['emi_headroom'], Decimal('16208.00'))
+
+
+class CreditScoreCacheTest(CustomerMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = self.create_customer()
+
+    def test_repeated_lookups_hit_cache(self):
+        CreditScoreCalculator.get_credit_score(self.customer.customer_id)
+        with self.assertNumQueries(0):
+            score = CreditScoreCalculator.get_credit_score(self.customer.customer_id)
+
+        self.assertEqual(score, 60)
+        self.assertEqual(CreditScoreCache.stats()['hits'], 1)
+        self.assertEqual(CreditScoreCache.stats()['misses'], 1)
+
+    def test_loan_write_invalidates_score(self):
+        CreditScoreCalculator.get_credit_score(self.customer.customer_id)
+        Loan.objects.create(
+            customer=self.customer,
+            loan_amount=Decimal('2000000.00'),
+            tenure=12,
+            interest_rate=Decimal('10.00'),
+            monthly_repayment=Decimal('175000.00'),
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=365)
+        )
+
+        self.assertEqual(CreditScoreCalculator.get_credit_score(self.customer.customer_id), 0)
+
+    def test_refresh_invalidates_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                CreditProfileService.refresh([self.customer.customer_id])
+                # A reader in another process scores the pre-commit profile
+                cache.set(CreditScoreCache.key(self.customer.customer_id), 0)
+
+        self.assertIsNone(cache.get(CreditScoreCache.key(self.customer.customer_id)))
+
+    def test_eligibility_then_create_loan_reuses_score(self):
+        LoanEligibilityService.check_eligibility(self.customer.customer_id, 50000, 12, 12)
+        LoanEligibilityService.create_loan(self.customer.customer_id, 50000, 12, 12)
+        self.assertEqual(CreditScoreCache.stats()['hits'], 1)
+
+
+class SourceFileMixin:
+    """Write throwaway source workbooks for ingestion tests"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.cache_dir = os.path.join(self.tmpdir.name, 'cache')
+        cache_override = override_settings(INGESTION_CACHE_DIR=self.cache_dir)
+        cache_override.enable()
+        self.addCleanup(cache_override.disable)
+
+    def write_excel(self, name, rows):
+        path = os.path.join(self.tmpdir.name, name)
+        pd.DataFrame(rows).to_excel(path, index=False)
+        return path
+
+    def customer_row(self, customer_id, phone_number, salary=50000, **overrides):
+        row = {
+            'Customer ID': customer_id, 'First Name': 'John', 'Last Name': 'Doe',
+            'Age': 30, 'Phone Number': phone_number, 'Monthly Salary': salary,
+            'Approved Limit': 36 * salary, 'Current Debt': 0,
+        }
+        row.update(overrides)
+        return row
+
+    def loan_row(self, loan_id, customer_id, **overrides):
+        row = {
+            'Customer ID': customer_id, 'Loan ID': loan_id, 'Principal': 100000,
+            'Tenure': 12, 'Interest Rate': 10.0, 'Monthly payment': 8792,
+            'EMIs paid on Time': 3, 'Date of Approval': timezone.now().date(),
+            'End Date': timezone.now().date() + timedelta(days=365),
+        }
+        row.update(overrides)
+        return row
+
+
+class ReadersTest(SourceFileMixin, SimpleTestCase):
+    def test_formats_stream_identical_chunks(self):
+        rows = [self.loan_row(loan_id, 1) for loan_id in range(10)]
+        expected = pd.DataFrame(rows)
+        paths = [self.write_excel('loans.xlsx', rows)]
+        for name, write in (('loans.csv', expected.to_csv), ('loans.parquet', expected.to_parquet)):
+            paths.append(os.path.join(self.tmpdir.name, name))
+            write(paths[-1], index=False)
+
+        for path in paths:
+            self.assertEqual(count_rows(path), 10)
+            chunks = list(iter_chunks(path, chunk_size=3, start=2, stop=9))
+            self.assertTrue(all(len(chunk) <= 3 for chunk in chunks))
+            self.assertEqual(list(pd.concat(chunks).index), list(range(2, 9)))
+            self.assertEqual(pd.concat(chunks)['Loan ID'].tolist(), list(range(2, 9)))
+
+    def test_csv_blank_lines_are_not_rows(self):
+        path = os.path.join(self.tmpdir.name, 'loans.csv')
+        with open(path, 'w') as f:
+            f.write('Loan ID,Tenure\n1,12\n\n2,12\n   \n3,12\n4,12\n')
+
+        self.assertEqual(count_rows(path), 4)
+        chunks = list(iter_chunks(path, chunk_size=2, start=1))
+        self.assertEqual(list(pd.concat(chunks).index), [1, 2, 3])
+        self.assertEqual(pd.concat(chunks)['Loan ID'].tolist(), [2, 3, 4])
+
+    def test_columnar_copy_of_workbook(self):
+        rows = [self.loan_row(loan_id, 1) for loan_id in range(10)]
+        path = self.write_excel('loans.xlsx', rows)
+
+        copy_path = columnar_copy(path, self.cache_dir)
+        self.assertEqual(os.path.basename(copy_path), f'{file_checksum(path)}.parquet')
+        self.assertEqual(columnar_copy(path, self.cache_dir), copy_path)
+        pd.testing.assert_frame_equal(
+            pd.concat(iter_chunks(copy_path, chunk_size=4)),
+            pd.concat(iter_chunks(path, chunk_size=4)),
+            check_dtype=False,
+        )
+
+        # Mixed number/text columns cannot be typed, so the workbook is read directly
+        rows[3]['Tenure'] = 'twelve'
+        path = self.write_excel('loans.xlsx', rows)
+        self.assertEqual(columnar_copy(path, self.cache_dir), path)
+
+    @mock.patch('loans.readers.PARQUET_ROW_GROUP_SIZE', 4)
+    def test_columnar_copy_converts_chunk_by_chunk(self):
+        rows = [self.loan_row(loan_id, 1) for loan_id in range(10)]
+        rows[6]['EMIs paid on Time'] = None
+        path = self.write_excel('loans.xlsx', rows)
+
+        copy_path = columnar_copy(path, self.cache_dir)
+        self.assertEqual(pq.ParquetFile(copy_path).metadata.num_row_groups, 3)
+        pd.testing.assert_frame_equal(
+            pd.concat(iter_chunks(copy_path, chunk_size=4)),
+            pd.concat(iter_chunks(path, chunk_size=4)),
+            check_dtype=False,
+        )
+
+        # A column that turns to text after the first chunk fails the cast
+        rows[9]['Tenure'] = 'twelve'
+        path = self.write_excel('loans.xlsx', rows)
+        self.assertEqual(columnar_copy(path, self.cache_dir), path)
+        self.assertFalse(any(name.endswith('.tmp') for name in os.listdir(self.cache_dir)))
+
+    def test_failed_columnar_copy_leaves_nothing_behind(self):
+        rows = [self.loan_row(loan_id, 1) for loan_id in range(10)]
+        path = self.write_excel('loans.xlsx', rows)
+
+        def chunks(*args):
+            yield pd.DataFrame(rows[:5])
+            raise OSError('disk full')
+
+        with mock.patch('loans.readers.iter_chunks', chunks):
+            with self.assertRaises(OSError):
+                columnar_copy(path, self.cache_dir)
+        # Not an Arrow typing problem, so the next load tries again
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_unsupported_extension(self):
+        with self.assertRaises(ValueError):
+            list(iter_chunks('loans.json', chunk_size=3))
+
+
+class NormalizationTest(SourceFileMixin, SimpleTestCase):
+    def test_normalize_loans_coerces_columns_and_splits_rejects(self):
+        rows = [self.loan_row(1, 1), self.loan_row(2, '2'), self.loan_row(3, 1, Tenure='twelve'),
+                self.loan_row(4, None), self.loan_row(5, 1, **{'End Date': 'soon'})]
+        for row in rows:
+            row['Loan Amount'] = row.pop('Principal')
+        df = pd.DataFrame(rows, index=range(10, 15))
+
+        clean, rejects = normalize_loans(df)
+
+        self.assertEqual(clean.index.tolist(), [10, 11])
+        self.assertEqual(clean['customer_id'].tolist(), [1, 2])
+        self.assertEqual(clean['loan_amount'].tolist(), [100000.0, 100000.0])
+        self.assertEqual(clean.iloc[0]['start_date'], timezone.now().date())
+        self.assertEqual(rejects.to_dict('index'), {
+            12: {'loan_id': 3, 'error': 'Invalid tenure'},
+            13: {'loan_id': 4, 'error': 'Missing or invalid customer ID'},
+            14: {'loan_id': 5, 'error': 'Invalid end date'},
+        })
+
+    def test_normalize_customers_fills_defaults(self):
+        row = self.customer_row(1, 9000000001, salary=50000)
+        del row['Approved Limit'], row['Current Debt']
+        clean, rejects = normalize_customers(pd.DataFrame([row, {**row, 'Phone Number': None}]))
+
+        self.assertEqual(len(rejects), 1)
+        self.assertEqual(clean.iloc[0]['approved_limit'], 1800000)
+        self.assertEqual(clean.iloc[0]['current_debt'], 0)
+        self.assertEqual(clean.iloc[0]['phone_number'], '9000000001')
+
+
+class IngestionTest(CustomerMixin, SourceFileMixin, TestCase):
+    def test_ingest_customer_data_bulk_upsert(self):
+        Customer.objects.create(
+            customer_id=1, first_name='Old', last_name='Name', age=40,
+            phone_number='9000000001', monthly_salary=Decimal('10000.00')
+        )
+        path = self.write_excel('customers.xlsx', [
+            self.customer_row(1, 9000000001, salary=20000),
+            self.customer_row(2, 9000000002),
+            self.customer_row(3, 9000000003, Age='unknown'),
+            self.customer_row(4, 9000000001),  # phone number taken by customer 1
+            self.customer_row(2, 9000000002, salary=60000),
+        ])
+
+        result = ingest_customer_data(path, batch_size=2)
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['customers_created'], 1)
+        self.assertEqual(result['customers_updated'], 2)
+        self.assertEqual(result['rows_failed'], 2)
+        self.assertEqual({error['customer_id'] for error in result['errors']}, {3, 4})
+        self.assertEqual(Customer.objects.get(customer_id=1).first_name, 'John')
+        self.assertEqual(Customer.objects.get(customer_id=2).monthly_salary, Decimal('60000.00'))
+
+        # Sequence moved past the ingested IDs
+        customer = Customer.objects.create(
+            first_name='New', last_name='Customer', age=25,
+            phone_number='9000000009', monthly_salary=Decimal('30000.00')
+        )
+        self.assertGreater(customer.customer_id, 2)
+
+    def test_ingest_loan_data_bulk_upsert(self):
+        customer = self.create_customer('9000000001')
+        path = self.write_excel('loans.xlsx', [
+            self.loan_row(loan_id, customer.customer_id) for loan_id in range(1, 7)
+        ] + [
+            self.loan_row(7, 99999),
+            self.loan_row(8, customer.customer_id, Tenure='twelve'),
+            self.loan_row(2, customer.customer_id, **{'EMIs paid on Time': 12}),
+        ])
+
+        result = ingest_loan_data(path, batch_size=5)
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['loans_created'], 6)
+        self.assertEqual(result['loans_updated'], 1)
+        self.assertEqual(result['rows_failed'], 2)
+        self.assertEqual(Loan.objects.get(loan_id=2).emis_paid_on_time, 12)
+        self.assertEqual(CreditProfileService.get_profile(customer.customer_id).total_loans, 6)
+
+        # Each batch costs a fixed number of queries, however many rows it
+        # holds. Both runs replace this manifest rather than creating one.
+        IngestionManifest.objects.create(
+            kind='loans', file_name='loans.xlsx', checksum='', rows_processed=0
+        )
+
+        def count_queries(loan_ids, batch_size):
+            path = self.write_excel('loans.xlsx', [
+                self.loan_row(loan_id, customer.customer_id) for loan_id in loan_ids
+            ])
+            with CaptureQueriesContext(connection) as queries:
+                ingest_loan_data(path, batch_size=batch_size)
+            return len(queries)
+
+        self.assertEqual(
+            count_queries(range(101, 105), batch_size=2),
+            count_queries(range(201, 209), batch_size=4),
+        )
+
+    def test_copy_all_data_matches_orm_ingestion(self):
+        customers_path = self.write_excel('customers.xlsx', [
+            self.customer_row(1, 9000000001),
+            self.customer_row(2, 9000000002, **{'First Name': 'Smith, "Jr"'}),
+            self.customer_row(1, 9000000001, salary=70000),
+        ])
+        loans_path = self.write_excel('loans.xlsx', [
+            self.loan_row(10, 1),
+            self.loan_row(11, 2),
+            self.loan_row(12, 99999),
+            self.loan_row(10, 1, **{'EMIs paid on Time': 7}),
+        ])
+
+        def snapshot():
+            return (
+                list(Customer.objects.order_by('customer_id').values(
+                    *CUSTOMER_UPDATE_FIELDS[:-1], 'customer_id')),
+                list(Loan.objects.order_by('loan_id').values(
+                    *LOAN_UPDATE_FIELDS[1:-1], 'loan_id', 'customer_id')),
+                list(CustomerCreditProfile.objects.order_by('customer_id').values(
+                    *CreditProfileService.PROFILE_FIELDS[:-1])),
+            )
+
+        result = copy_all_data(customers_path, loans_path)
+        self.assertEqual(result['customer_ingestion']['customers_created'], 2)
+        self.assertEqual(result['loan_ingestion']['loans_created'], 2)
+        self.assertEqual(result['loan_ingestion']['rows_failed'], 1)
+        copied = snapshot()
+
+        Customer.objects.all().delete()
+        ingest_customer_data(customers_path, force=True)
+        ingest_loan_data(loans_path, force=True)
+        self.assertEqual(copied, snapshot())
+
+    def test_delta_ingestion_skips_unchanged_rows_and_files(self):
+        rows = [self.customer_row(customer_id, 9000000000 + customer_id) for customer_id in (1, 2, 3)]
+        path = self.write_excel('customers.xlsx', rows)
+        self.assertEqual(ingest_customer_data(path)['customers_created'], 3)
+        self.assertEqual(IngestionManifest.objects.get(kind='customers').rows_processed, 3)
+
+        # Identical file: the manifest lookup and the table count
+        with self.assertNumQueries(2):
+            result = ingest_customer_data(path)
+        self.assertTrue(result['skipped'])
+
+        before = dict(Customer.objects.values_list('customer_id', 'updated_at'))
+        rows[1] = self.customer_row(2, 9000000002, salary=90000)
+        path = self.write_excel('customers.xlsx', rows + [self.customer_row(4, 9000000004)])
+        result = ingest_customer_data(path)
+
+        self.assertEqual(result['customers_created'], 1)
+        self.assertEqual(result['customers_updated'], 1)
+        self.assertEqual(result['customers_unchanged'], 2)
+        after = dict(Customer.objects.values_list('customer_id', 'updated_at'))
+        self.assertEqual(after[1], before[1])
+        self.assertNotEqual(after[2], before[2])
+
+        result = ingest_customer_data(path, force=True)
+        self.assertEqual(result['customers_updated'], 4)
+        self.assertEqual(result['customers_unchanged'], 0)
+
+    def test_emptied_table_is_reloaded_despite_manifest(self):
+        path = self.write_excel('customers.xlsx', [
+            self.customer_row(customer_id, 9000000000 + customer_id) for customer_id in (1, 2)
+        ])
+        ingest_customer_data(path)
+        Customer.objects.all().delete()
+
+        result = ingest_customer_data(path)
+        self.assertFalse(result.get('skipped'))
+        self.assertEqual(result['customers_created'], 2)
+        self.assertTrue(ingest_customer_data(path)['skipped'])
+
+    def test_copy_keeps_blank_names(self):
+        result = copy_all_data(
+            self.write_excel('customers.xlsx', [self.customer_row(1, 9000000001, **{'Last Name': None})]),
+            self.write_excel('loans.xlsx', [self.loan_row(10, 1)])
+        )
+        self.assertEqual(result['customer_ingestion']['status'], 'success')
+        self.assertEqual(Customer.objects.get().last_name, '')
+        self.assertEqual(Loan.objects.count(), 1)
+
+    def test_copy_all_data_requires_empty_tables(self):
+        self.create_customer('9000000001')
+        result = copy_all_data(
+            self.write_excel('customers.xlsx', [self.customer_row(5, 9000000005)]),
+            self.write_excel('loans.xlsx', [self.loan_row(10, 5)])
+        )
+        self.assertEqual(result['customer_ingestion']['status'], 'error')
+        self.assertFalse(Customer.objects.filter(customer_id=5).exists())
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        path = self.write_excel('customers.xlsx', [
+            self.customer_row(customer_id, 9000000000 + customer_id)
+            for customer_id in range(1, 6)
+        ])
+
+        def crash_after_first_batch(df, batch_size, report, force=False):
+            if report.created:
+                raise RuntimeError("worker lost")
+            return upsert_customers(df, batch_size, report, force=force)
+
+        with self.assertRaises(RuntimeError):
+            ingest_file(crash_after_first_batch, 'customers', path, 2)
+        run = IngestionRun.objects.get()
+        self.assertEqual((run.status, run.next_row, run.rows_processed), (IngestionRun.FAILED, 2, 2))
+        self.assertEqual(Customer.objects.count(), 2)
+
+        result = ingest_customer_data(path, batch_size=2, resume=True)
+
+        # The committed batch is neither re-read nor counted twice
+        self.assertEqual(result['customers_created'], 5)
+        self.assertEqual(result['customers_unchanged'], 0)
+        self.assertEqual(result['total_processed'], 5)
+        run.refresh_from_db()
+        self.assertEqual((run.status, run.next_row), (IngestionRun.COMPLETED, 5))
+        self.assertEqual(Customer.objects.count(), 5)
+
+    def test_load_data_existing_data_guard_and_copy_conflict(self):
+        self.create_customer('9000000001')
+        out = StringIO()
+        call_command('load_data', stdout=out)
+        self.assertIn('Skipping ingestion', out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command('load_data', '--copy', '--resume', stdout=StringIO())
+
+
+class ParallelIngestionTest(SourceFileMixin, TransactionTestCase):
+    def test_parallel_ingestion(self):
+        customers_path = self.write_excel('customers.xlsx', [
+            self.customer_row(customer_id, 9000000000 + customer_id)
+            for customer_id in range(1, 8)
+        ])
+        loans_path = self.write_excel('loans.xlsx', [
+            self.loan_row(loan_id, loan_id % 7 + 1) for loan_id in range(1, 12)
+        ] + [self.loan_row(12, 99999)])
+
+        with start_worker(celery_app, pool='threads', concurrency=4, perform_ping_check=False):
+            result = ingest_all_data_parallel.delay(
+                customers_path, loans_path, chunk_rows=3
+            ).get(timeout=30)
+
+        self.assertEqual(result['customer_ingestion']['customers_created'], 7)
+        self.assertEqual(result['customer_ingestion']['total_processed'], 7)
+        self.assertEqual(result['loan_ingestion']['loans_created'], 11)
+        self.assertEqual(result['loan_ingestion']['rows_failed'], 1)
+        self.assertEqual(result['loan_ingestion']['errors'][0]['row'], 11)
+        self.assertEqual(CustomerCreditProfile.objects.count(), 7)
+
+
+class ConcurrentLoanCreationTest(CustomerMixin, TransactionTestCase):
+    def test_concurrent_loans_for_one_customer_stay_consistent(self):
+        customer = self.create_customer()
+        # Roughly four of these fit in the 25000 EMI headroom
+        attempts = 10
+        barrier = threading.Barrier(attempts)
+        results = []
+
+        def apply():
+            try:
+                barrier.wait()
+                results.append(LoanEligibilityService.create_loan(
+                    customer.customer_id, Decimal('60000.00'), 12, 12
+                ))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=apply) for _ in range(attempts)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        approved = [result for result in results if result['loan_approved']]
+        self.assertEqual(len(results), attempts)
+        self.assertTrue(0 < len(approved) < attempts)
+        self.assertEqual(Loan.objects.count(), len(approved))
+
+        customer.refresh_from_db()
+        self.assertEqual(customer.current_debt, Decimal('60000.00') * len(approved))
+        total_emis = Loan.objects.aggregate(total=Sum('monthly_repayment'))['total']
+        self.assertLessEqual(total_emis, customer.monthly_salary * Decimal('0.5'))
+
+        fields = CreditProfileService.PROFILE_FIELDS[:-1]
+        incremental = CustomerCreditProfile.objects.values(*fields).get()
+        CreditProfileService.refresh([customer.customer_id])
+        self.assertEqual(incremental, CustomerCreditProfile.objects.values(*fields).get())
+
+
+class AsyncLoanCreationTest(CustomerMixin, APITransactionTestCase):
+    def test_queued_application_reports_result(self):
+        customer = self.create_customer()
+        data = {
+            'customer_id': customer.customer_id,
+            'loan_amount': '100000.00',
+            'interest_rate': '12.00',
+            'tenure': 12
+        }
+        response = self.client.post(reverse('create_loan') + '?async=1', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = response.json()
+        self.assertEqual(response['Location'], job['status_url'])
+        self.assertEqual(Loan.objects.count(), 0)
+
+        with start_worker(celery_app, pool='threads', concurrency=1, perform_ping_check=False):
+            for _ in range(100):
+                result = self.client.get(job['status_url']).json()
+                if result['status'] == 'SUCCESS':
+                    break
+                time.sleep(0.05)
+
+        self.assertEqual(result['status'], 'SUCCESS')
+        self.assertTrue(result['result']['loan_approved'])
+        self.assertEqual(result['result']['loan_id'], Loan.objects.get().loan_id)
+
+
 class CustomerAPITest(APITestCase):
     def test_register_customer(self):
         url = reverse('register_customer')
@@ -217,6 +918,282 @@ class EligibilityAPITest(APITestCase):
         self.assertIn('not found', result['message'])
 
 
+class RateLimitTest(CustomerMixin, APITestCase):
+    def setUp(self):
+        self.limiter = RateLimiter(fakeredis.FakeRedis())
+        patcher = mock.patch.object(RateLimiter, 'default', return_value=self.limiter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_token_bucket_refills(self):
+        buckets = [('test', 3, 1)]
+        self.assertEqual([self.limiter.take(buckets, now=0) for _ in range(4)], [0, 0, 0, 1])
+        self.assertEqual(self.limiter.take(buckets, now=1000), 0)
+        self.assertEqual(self.limiter.take(buckets, now=1000), 1)
+
+    def test_refused_request_takes_no_tokens(self):
+        self.assertEqual(self.limiter.take([('narrow', 1, 0.5), ('wide', 2, 1)], now=0), 0)
+        self.assertEqual(self.limiter.take([('narrow', 1, 0.5), ('wide', 2, 1)], now=0), 2)
+        self.assertEqual(self.limiter.take([('wide', 2, 1)], now=0), 0)
+
+    def test_concurrency_budget(self):
+        first = self.limiter.acquire_slot(2, 30, now=0)
+        self.assertIsNotNone(self.limiter.acquire_slot(2, 30, now=0))
+        self.assertIsNone(self.limiter.acquire_slot(2, 30, now=0))
+
+        self.limiter.release_slot(first)
+        self.assertIsNotNone(self.limiter.acquire_slot(2, 30, now=0))
+        # Slots held past their timeout lapse
+        self.assertIsNotNone(self.limiter.acquire_slot(2, 30, now=30001))
+
+    @override_settings(
+        RATE_LIMIT_ENABLED=True,
+        RATE_LIMITS={'endpoint': (100, 1), 'client': (100, 1), 'customer': (2, 0.5)},
+    )
+    def test_views_shed_per_customer_and_at_capacity(self):
+        customers = [
+            self.create_customer(f'123456789{i}')
+            for i in range(2)
+        ]
+        url = reverse('check_eligibility')
+        data = {'loan_amount': '100000.00', 'interest_rate': '12.00', 'tenure': 12}
+
+        codes = [
+            self.client.post(url, {**data, 'customer_id': customers[0].customer_id}, format='json')
+            for _ in range(3)
+        ]
+        self.assertEqual([response.status_code for response in codes], [200, 200, 429])
+        self.assertEqual(codes[-1]['Retry-After'], '2')
+        response = self.client.post(url, {**data, 'customer_id': customers[1].customer_id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Every slot was handed back
+        self.assertEqual(self.limiter.client.zcard(RateLimiter.CONCURRENCY_KEY), 0)
+
+        with override_settings(RATE_LIMIT_MAX_CONCURRENCY=0):
+            response = self.client.get(reverse('view_customer_loans', kwargs={'customer_id': customers[1].customer_id}))
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '1')
+
+    @override_settings(RATE_LIMIT_ENABLED=True)
+    def test_streaming_response_holds_slot_until_sent(self):
+        customer = self.create_customer()
+        url = reverse('view_customer_loans', kwargs={'customer_id': customer.customer_id})
+        response = self.client.get(url, {'stream': 1})
+        self.assertTrue(response.streaming)
+        self.assertEqual(self.limiter.client.zcard(RateLimiter.CONCURRENCY_KEY), 1)
+
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [])
+        self.assertEqual(self.limiter.client.zcard(RateLimiter.CONCURRENCY_KEY), 0)
+
+    @override_settings(
+        RATE_LIMIT_ENABLED=True,
+        RATE_LIMITS={'endpoint': (100, 1), 'client': (100, 1), 'customer': (1, 0.5)},
+    )
+    async def test_async_views_are_limited_on_the_event_loop(self):
+        async def get_response(request):
+            return None
+        self.assertTrue(asyncio.iscoroutinefunction(RateLimitMiddleware(get_response)))
+
+        url = reverse('async_view_customer_loans', kwargs={'customer_id': 99999})
+        responses = [await self.async_client.get(url) for _ in range(2)]
+        self.assertEqual([response.status_code for response in responses], [404, 429])
+        self.assertEqual(self.limiter.client.zcard(RateLimiter.CONCURRENCY_KEY), 0)
+
+
+@override_settings(METRICS_ENABLED=True)
+class MetricsTest(CustomerMixin, SourceFileMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.metrics = Metrics(fakeredis.FakeRedis())
+        patcher = mock.patch.object(Metrics, 'default', return_value=self.metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if not line.startswith('#'):
+                series, value = line.rsplit(' ', 1)
+                samples[series] = float(value)
+        return samples
+
+    def test_requests_and_scoring_are_measured(self):
+        customer = self.create_customer()
+        data = {
+            'customer_id': customer.customer_id,
+            'loan_amount': '100000.00',
+            'interest_rate': '12.00',
+            'tenure': 12
+        }
+        for _ in range(2):
+            self.client.post(reverse('check_eligibility'), data, format='json')
+
+        samples = self.scrape()
+        labels = 'method="POST",status="200",view="check_eligibility"'
+        self.assertEqual(samples[f'http_request_duration_seconds_count{{{labels}}}'], 2)
+        self.assertEqual(samples[f'http_request_duration_seconds_bucket{{le="+Inf",{labels}}}'], 2)
+        self.assertGreater(samples['http_request_db_queries_sum{view="check_eligibility"}'], 0)
+        self.assertEqual(samples['scoring_duration_seconds_count{operation="check_eligibility"}'], 2)
+        self.assertEqual(samples['cache_requests_total{cache="credit_score",result="hit"}'],
+                         CreditScoreCache.stats()['hits'])
+        # The scrape itself is not a loans view
+        self.assertFalse(any('view="metrics"' in series for series in samples))
+
+    def test_streamed_scores_are_measured_when_sent(self):
+        customer = self.create_customer()
+        response = self.client.post(
+            reverse('bulk_credit_scores'), {'customer_ids': [customer.customer_id, 99999]}, format='json'
+        )
+        self.assertFalse(any('bulk_credit_scores' in series for series in self.scrape()))
+
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content))), 2)
+        samples = self.scrape()
+        self.assertEqual(samples['scoring_duration_seconds_count{operation="calculate_credit_scores"}'], 1)
+        self.assertGreater(samples['scoring_duration_seconds_sum{operation="calculate_credit_scores"}'], 0)
+        self.assertEqual(samples['http_request_db_queries_count{view="bulk_credit_scores"}'], 1)
+        # The scoring query runs while the body is streamed
+        self.assertGreater(samples['http_request_db_queries_sum{view="bulk_credit_scores"}'], 0)
+
+    async def test_async_views_are_measured(self):
+        await self.async_client.get(reverse('async_view_loan', kwargs={'loan_id': 99999}))
+
+        samples = await sync_to_async(self.scrape)()
+        self.assertEqual(
+            samples['http_request_duration_seconds_count{method="GET",status="404",view="async_view_loan"}'], 1
+        )
+        self.assertEqual(samples['http_request_db_queries_sum{view="async_view_loan"}'], 1)
+
+    async def test_async_eligibility_checks_are_scored(self):
+        data = {
+            'customer_id': 99999,
+            'loan_amount': '100000.00',
+            'interest_rate': '12.00',
+            'tenure': 12
+        }
+        await self.async_client.post(
+            reverse('async_check_eligibility'), data, content_type='application/json'
+        )
+
+        samples = await sync_to_async(self.scrape)()
+        self.assertEqual(samples['scoring_duration_seconds_count{operation="check_eligibility"}'], 1)
+
+    @override_settings(DEBUG=True)
+    def test_asgi_middleware_chain_stays_async(self):
+        # In debug mode Django logs each sync/async switch it inserts
+        # between middleware
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            handler = ASGIHandler()
+        self.assertTrue(asyncio.iscoroutinefunction(handler._middleware_chain))
+
+    def test_ingestion_throughput(self):
+        path = self.write_excel('customers.xlsx', [
+            self.customer_row(customer_id, 9000000000 + customer_id) for customer_id in range(1, 4)
+        ])
+        ingest_file(upsert_customers, 'customers', path, batch_size=2)
+
+        samples = self.scrape()
+        self.assertEqual(samples['ingestion_rows_total{kind="customers"}'], 3)
+        self.assertGreater(samples['ingestion_duration_seconds_total{kind="customers"}'], 0)
+        self.assertGreater(samples['ingestion_rows_per_second{kind="customers"}'], 0)
+
+
+class BulkEligibilityAPITest(CustomerMixin, APITestCase):
+    def setUp(self):
+        self.customers = [
+            self.create_customer(f'123456789{i}')
+            for i in range(2)
+        ]
+
+    def test_bulk_check_eligibility(self):
+        url = reverse('bulk_check_eligibility')
+        data = [
+            {'customer_id': self.customers[0].customer_id, 'loan_amount': '100000.00',
+             'interest_rate': '12.00', 'tenure': 12},
+            {'customer_id': self.customers[0].customer_id, 'loan_amount': '1000000.00',
+             'interest_rate': '12.00', 'tenure': 12},
+            {'customer_id': self.customers[1].customer_id, 'loan_amount': '-5',
+             'interest_rate': '12.00', 'tenure': 12},
+            {'customer_id': 99999, 'loan_amount': '100000.00',
+             'interest_rate': '12.00', 'tenure': 12},
+        ]
+
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        result = response.json()
+        self.assertEqual(len(result), 4)
+        self.assertTrue(result[0]['approval'])
+        self.assertFalse(result[1]['approval'])
+        self.assertIn('loan_amount', result[2]['errors'])
+        self.assertIn('not found', result[3]['message'])
+
+    def test_bulk_check_eligibility_loads_profiles_once(self):
+        CreditProfileService.refresh([customer.customer_id for customer in self.customers])
+        applications = [
+            {'customer_id': customer.customer_id, 'loan_amount': Decimal('100000.00'),
+             'interest_rate': Decimal('12.00'), 'tenure': tenure}
+            for customer in self.customers
+            for tenure in (6, 12, 24)
+        ]
+
+        with self.assertNumQueries(1):
+            results = LoanEligibilityService.check_eligibility_bulk(applications)
+
+        self.assertEqual(results, [
+            LoanEligibilityService.check_eligibility(**application)
+            for application in applications
+        ])
+
+
+class BulkCreditScoreAPITest(CustomerMixin, APITestCase):
+    def setUp(self):
+        self.customer = self.create_customer()
+
+    def test_bulk_credit_scores(self):
+        url = reverse('bulk_credit_scores')
+        data = {'customer_ids': [self.customer.customer_id, 99999]}
+
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        result = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(result[0]['customer_id'], self.customer.customer_id)
+        self.assertEqual(result[0]['credit_score'], 60)
+        self.assertIsNone(result[1]['credit_score'])
+
+    def test_bulk_credit_scores_empty_list(self):
+        url = reverse('bulk_credit_scores')
+        response = self.client.post(url, {'customer_ids': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class EmiQuoteAPITest(APITestCase):
+    def test_emi_quote_grid(self):
+        url = reverse('emi_quote')
+        response = self.client.get(url, {
+            'loan_amount': '100000.00',
+            'interest_rates': ['10.00', '12.00'],
+            'tenures': [6, 12, 24],
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        result = response.json()
+        self.assertEqual(len(result['monthly_installments']), 2)
+        self.assertEqual(len(result['monthly_installments'][0]), 3)
+        self.assertEqual(
+            result['monthly_installments'][1][1],
+            LoanEligibilityService.calculate_monthly_emi(100000, 12, 12)
+        )
+
+    def test_emi_quote_requires_tenures(self):
+        url = reverse('emi_quote')
+        response = self.client.get(url, {'loan_amount': '100000.00', 'interest_rates': ['10.00']})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class LoanAPITest(APITestCase):
     def setUp(self):
         self.customer = Customer.objects.create(
@@ -247,6 +1224,62 @@ class LoanAPITest(APITestCase):
         # Verify loan was created in database
         self.assertEqual(Loan.objects.count(), 1)
 
+    def test_create_loan_idempotency_key(self):
+        cache.clear()
+        url = reverse('create_loan')
+        data = {
+            'customer_id': self.customer.customer_id,
+            'loan_amount': '100000.00',
+            'interest_rate': '12.00',
+            'tenure': 12
+        }
+        first = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        # A retry never reaches scoring or the insert
+        with self.assertNumQueries(0):
+            retry = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Loan.objects.count(), 1)
+
+        data['loan_amount'] = '50000.00'
+        response = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        response = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='order-2')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Loan.objects.count(), 2)
+
+    def test_create_loan_waits_for_request_in_flight(self):
+        cache.clear()
+        url = reverse('create_loan')
+        data = {
+            'customer_id': self.customer.customer_id,
+            'loan_amount': '100000.00',
+            'interest_rate': '12.00',
+            'tenure': 12
+        }
+        body = json.dumps(data).encode()
+        in_flight = {'loan_id': 41, 'loan_approved': True}
+
+        # Another worker holds the key and finishes shortly
+        self.assertTrue(IdempotencyCache.acquire(url, 'order-1'))
+
+        def finish():
+            IdempotencyCache.set(url, 'order-1', hashlib.sha256(body).hexdigest(), 201, in_flight)
+            IdempotencyCache.release(url, 'order-1')
+
+        timer = threading.Timer(0.2, finish)
+        timer.start()
+
+        response = self.client.generic('POST', url, body, content_type='application/json',
+                                       HTTP_IDEMPOTENCY_KEY='order-1')
+        timer.join()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json(), in_flight)
+        self.assertEqual(Loan.objects.count(), 0)
+
     def test_view_loan(self):
         loan = Loan.objects.create(
             customer=self.customer,
@@ -266,6 +1299,57 @@ class LoanAPITest(APITestCase):
         self.assertEqual(result['loan_id'], loan.loan_id)
         self.assertEqual(result['customer']['customer_id'], self.customer.customer_id)
 
+    def test_view_loan_conditional_get(self):
+        loan = Loan.objects.create(
+            customer=self.customer,
+            loan_amount=Decimal('100000.00'),
+            tenure=12,
+            interest_rate=Decimal('10.00'),
+            monthly_repayment=Decimal('8792.00'),
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=365)
+        )
+        url = reverse('view_loan', kwargs={'loan_id': loan.loan_id})
+        etag = self.client.get(url)['ETag']
+
+        # Only the validator query; nothing is serialized
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # A customer write changes the embedded data, so the ETag moves
+        self.customer.current_debt = Decimal('5000.00')
+        self.customer.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['customer']['current_debt'], '5000.00')
+
+        self.assertEqual(self.client.get(reverse('view_loan', kwargs={'loan_id': 999999})).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+    @override_settings(LOAN_RESPONSE_CACHE_TIMEOUT=60)
+    def test_view_loan_response_cache(self):
+        cache.clear()
+        loan = Loan.objects.create(
+            customer=self.customer,
+            loan_amount=Decimal('100000.00'),
+            tenure=12,
+            interest_rate=Decimal('10.00'),
+            monthly_repayment=Decimal('8792.00'),
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=365)
+        )
+        url = reverse('view_loan', kwargs={'loan_id': loan.loan_id})
+        first = self.client.get(url).json()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).json(), first)
+
+        loan.emis_paid_on_time = 4
+        loan.save()
+        self.assertIsNone(cache.get(LoanResponseCache.key(loan.loan_id)))
+        self.assertEqual(self.client.get(url).json()['emis_paid_on_time'], 4)
+
     def test_view_customer_loans(self):
         # Create multiple loans for the customer
         for i in range(3):
@@ -284,4 +1368,126 @@ class LoanAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         
         result = response.json()
-        self.assertEqual(len(result), 3)
+        self.assertEqual(len(result['results']), 3)
+        self.assertIsNone(result['next'])
+
+    def test_view_customer_loans_keyset_pages(self):
+        for i in range(5):
+            Loan.objects.create(
+                customer=self.customer,
+                loan_amount=Decimal('100000.00'),
+                tenure=12,
+                interest_rate=Decimal('10.00'),
+                monthly_repayment=Decimal('8792.00'),
+                start_date=timezone.now().date(),
+                end_date=timezone.now().date() + timedelta(days=365)
+            )
+
+        url = reverse('view_customer_loans', kwargs={'customer_id': self.customer.customer_id})
+        url += '?page_size=2'
+        loan_ids = []
+        while url:
+            # The customer lookup and the page; no per-loan customer fetch
+            with self.assertNumQueries(2):
+                result = self.client.get(url).json()
+            loan_ids += [loan['loan_id'] for loan in result['results']]
+            self.assertTrue(all(loan['customer_name'] == 'John Doe' for loan in result['results']))
+            url = result['next']
+
+        self.assertEqual(loan_ids, sorted(Loan.objects.values_list('loan_id', flat=True)))
+
+    def test_view_customer_loans_stream(self):
+        for i in range(3):
+            Loan.objects.create(
+                customer=self.customer,
+                loan_amount=Decimal('100000.00'),
+                tenure=12,
+                interest_rate=Decimal('10.00'),
+                monthly_repayment=Decimal('8792.00'),
+                start_date=timezone.now().date(),
+                end_date=timezone.now().date() + timedelta(days=365)
+            )
+
+        url = reverse('view_customer_loans', kwargs={'customer_id': self.customer.customer_id})
+        paged = self.client.get(url).json()['results']
+        response = self.client.get(url, {'stream': '1'})
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), paged)
+
+
+class AsyncViewsTest(CustomerMixin, TestCase):
+    def setUp(self):
+        self.customer = self.create_customer()
+        self.loans = [
+            Loan.objects.create(
+                customer=self.customer,
+                loan_amount=Decimal('100000.00'),
+                tenure=12,
+                interest_rate=Decimal('10.00'),
+                monthly_repayment=Decimal('8792.00'),
+                emis_paid_on_time=i,
+                start_date=timezone.now().date(),
+                end_date=timezone.now().date() + timedelta(days=365)
+            )
+            for i in range(3)
+        ]
+        # No stored profile, so the async path has to aggregate the loans
+        CustomerCreditProfile.objects.all().delete()
+
+    async def test_check_eligibility_matches_sync(self):
+        data = {
+            'customer_id': self.customer.customer_id,
+            'loan_amount': '100000.00',
+            'interest_rate': '12.00',
+            'tenure': 12
+        }
+        response = await self.async_client.post(
+            reverse('async_check_eligibility'), data, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The stale profile is computed in memory, not written
+        self.assertFalse(await CustomerCreditProfile.objects.aexists())
+
+        expected = await sync_to_async(self.client.post)(
+            reverse('check_eligibility'), data, content_type='application/json'
+        )
+        self.assertEqual(response.json(), expected.json())
+
+        data['customer_id'] = 99999
+        response = await self.async_client.post(
+            reverse('async_check_eligibility'), data, content_type='application/json'
+        )
+        self.assertIn('not found', response.json()['message'])
+
+    async def test_check_eligibility_rejects_invalid_input(self):
+        url = reverse('async_check_eligibility')
+        response = await self.async_client.post(url, {'tenure': 0}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('customer_id', response.json())
+
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_view_loan_matches_sync(self):
+        loan_id = self.loans[0].loan_id
+        response = await self.async_client.get(reverse('async_view_loan', kwargs={'loan_id': loan_id}))
+        expected = await sync_to_async(self.client.get)(reverse('view_loan', kwargs={'loan_id': loan_id}))
+        self.assertEqual(response.json(), expected.json())
+
+        response = await self.async_client.get(reverse('async_view_loan', kwargs={'loan_id': 999999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_view_customer_loans_pages(self):
+        url = reverse('async_view_customer_loans', kwargs={'customer_id': self.customer.customer_id})
+        url += '?page_size=2'
+        results = []
+        while url:
+            result = (await self.async_client.get(url)).json()
+            results += result['results']
+            url = result['next']
+
+        expected = await sync_to_async(self.client.get)(
+            reverse('view_customer_loans', kwargs={'customer_id': self.customer.customer_id})
+        )
+        self.assertEqual(results, expected.json()['results'])
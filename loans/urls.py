@@ -1,10 +1,17 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('register/', views.register_customer, name='register_customer'),
     path('check-eligibility/', views.check_eligibility, name='check_eligibility'),
+    path('check-eligibility/bulk/', views.bulk_check_eligibility, name='bulk_check_eligibility'),
+    path('credit-scores/', views.bulk_credit_scores, name='bulk_credit_scores'),
+    path('emi-quote/', views.emi_quote, name='emi_quote'),
     path('create-loan/', views.create_loan, name='create_loan'),
+    path('loan-jobs/<uuid:job_id>/', views.loan_job_status, name='loan_job_status'),
     path('view-loan/<int:loan_id>/', views.view_loan, name='view_loan'),
     path('view-loans/<int:customer_id>/', views.view_customer_loans, name='view_customer_loans'),
+    path('async/check-eligibility/', async_views.check_eligibility, name='async_check_eligibility'),
+    path('async/view-loan/<int:loan_id>/', async_views.view_loan, name='async_view_loan'),
+    path('async/view-loans/<int:customer_id>/', async_views.view_customer_loans, name='async_view_customer_loans'),
 ]
@@ -1,16 +1,85 @@
-from rest_framework import status
+import hashlib
+
+import numpy as np
+from rest_framework import serializers, status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from drf_spectacular.utils import extend_schema, OpenApiParameter
+from django.urls import reverse
+from django.views.decorators.http import condition
+from drf_spectacular.utils import extend_schema, inline_serializer, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 
+from .cache import LoanResponseCache
+from .idempotency import IDEMPOTENCY_HEADER, idempotent
+from .metrics import record_cache_lookup
 from .models import Customer, Loan
+from .pagination import LoanCursorPagination
 from .serializers import (
     CustomerSerializer, CustomerRegistrationSerializer, LoanSerializer,
-    LoanDetailSerializer, EligibilityCheckSerializer, LoanCreationSerializer
+    LoanDetailSerializer, EligibilityCheckSerializer, LoanCreationSerializer,
+    BulkCreditScoreSerializer, EmiQuoteSerializer
 )
-from .services import LoanEligibilityService
+from .services import CreditScoreCalculator, LoanEligibilityService
+from .tasks import process_loan_application
+
+BULK_ELIGIBILITY_MAX_ITEMS = 1000
+
+# Rows fetched per round trip from the server-side cursor when streaming loans
+LOAN_STREAM_CHUNK_SIZE = 2000
+
+
+def _flag(request, name):
+    return request.query_params.get(name) in ('1', 'true')
+
+
+def _stream_json_array(items):
+    """
+    Encode an iterable of JSON-serializable items as a JSON array, one
+    element at a time
+    """
+    encoder = JSONEncoder()
+    yield '['
+    for index, item in enumerate(items):
+        yield (',' if index else '') + encoder.encode(item)
+    yield ']'
+
+
+def _loan_validators(request, loan_id):
+    """
+    (etag, last_modified) for a loan, derived from its own and its
+    customer's updated_at in one query, or None if the loan does not exist.
+    Memoized on the request: condition() asks for each value separately
+    and the view needs the ETag again.
+    """
+    if not hasattr(request, '_loan_validators'):
+        row = (
+            Loan.objects.filter(loan_id=loan_id)
+            .values_list('updated_at', 'customer__updated_at')
+            .first()
+        )
+        if row is None:
+            request._loan_validators = None
+        else:
+            loan_updated, customer_updated = row
+            version = f'{loan_id}:{loan_updated.isoformat()}:{customer_updated.isoformat()}'
+            request._loan_validators = (
+                hashlib.md5(version.encode(), usedforsecurity=False).hexdigest(),
+                max(loan_updated, customer_updated),
+            )
+    return request._loan_validators
+
+
+def _loan_etag(request, loan_id):
+    validators = _loan_validators(request, loan_id)
+    return validators and validators[0]
+
+
+def _loan_last_modified(request, loan_id):
+    validators = _loan_validators(request, loan_id)
+    return validators and validators[1]
 
 
 @extend_schema(
@@ -57,15 +126,122 @@ def check_eligibility(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@extend_schema(
+    request=EligibilityCheckSerializer(many=True),
+    responses={200: dict},
+    description="Check loan eligibility for many applications in one request"
+)
+@api_view(['POST'])
+def bulk_check_eligibility(request):
+    """
+    Check a list of loan applications, validating and deciding each item
+    independently
+    """
+    if not isinstance(request.data, list) or not request.data:
+        return Response(
+            {'detail': 'Expected a non-empty list of applications'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(request.data) > BULK_ELIGIBILITY_MAX_ITEMS:
+        return Response(
+            {'detail': f'At most {BULK_ELIGIBILITY_MAX_ITEMS} applications per request'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    results = [None] * len(request.data)
+    applications = []
+    positions = []
+    for index, item in enumerate(request.data):
+        serializer = EligibilityCheckSerializer(data=item)
+        if serializer.is_valid():
+            applications.append(serializer.validated_data)
+            positions.append(index)
+        else:
+            results[index] = {'approval': False, 'errors': serializer.errors}
+
+    eligibility_results = LoanEligibilityService.check_eligibility_bulk(applications)
+    for index, eligibility_result in zip(positions, eligibility_results):
+        results[index] = eligibility_result
+
+    return Response(results, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    request=BulkCreditScoreSerializer,
+    responses={200: dict},
+    description="Calculate credit scores for many customers in one request"
+)
+@api_view(['POST'])
+def bulk_credit_scores(request):
+    """
+    Stream credit scores for a list of customer IDs
+    """
+    serializer = BulkCreditScoreSerializer(data=request.data)
+    if serializer.is_valid():
+        scores = CreditScoreCalculator.calculate_credit_scores(
+            serializer.validated_data['customer_ids']
+        )
+        results = (
+            {'customer_id': customer_id, 'credit_score': score}
+            if score is not None else
+            {'customer_id': customer_id, 'credit_score': None, 'message': 'Customer not found'}
+            for customer_id, score in scores
+        )
+        return StreamingHttpResponse(
+            _stream_json_array(results), content_type='application/json'
+        )
+
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@extend_schema(
+    parameters=[EmiQuoteSerializer],
+    responses={200: dict},
+    description="Quote monthly installments for every interest rate and tenure combination"
+)
+@api_view(['GET'])
+def emi_quote(request):
+    """
+    Return a grid of EMIs with one row per interest rate and one column per tenure
+    """
+    serializer = EmiQuoteSerializer(data=request.query_params)
+    if serializer.is_valid():
+        loan_amount = serializer.validated_data['loan_amount']
+        interest_rates = [float(rate) for rate in serializer.validated_data['interest_rates']]
+        tenures = serializer.validated_data['tenures']
+
+        grid = LoanEligibilityService.calculate_monthly_emis(
+            float(loan_amount), np.array(interest_rates)[:, np.newaxis], np.array(tenures)
+        )
+
+        return Response({
+            'loan_amount': float(loan_amount),
+            'interest_rates': interest_rates,
+            'tenures': tenures,
+            'monthly_installments': grid.tolist(),
+        }, status=status.HTTP_200_OK)
+
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 @extend_schema(
     request=LoanCreationSerializer,
-    responses={201: dict},
+    responses={201: dict, 202: dict},
+    parameters=[
+        OpenApiParameter(name='async', type=OpenApiTypes.BOOL, description="Queue the application and return 202 with a job ID"),
+        OpenApiParameter(
+            name=IDEMPOTENCY_HEADER, type=OpenApiTypes.STR, location=OpenApiParameter.HEADER,
+            description="Retries with the same key and body get the first response back"
+        ),
+    ],
     description="Create a new loan if eligible"
 )
 @api_view(['POST'])
+@idempotent
 def create_loan(request):
     """
-    Create a new loan if the customer is eligible
+    Create a new loan if the customer is eligible. With ?async=1 the
+    validated application is queued for a worker and a job ID returned.
     """
     serializer = LoanCreationSerializer(data=request.data)
     if serializer.is_valid():
@@ -74,6 +250,19 @@ def create_loan(request):
         interest_rate = serializer.validated_data['interest_rate']
         tenure = serializer.validated_data['tenure']
         
+        if _flag(request, 'async'):
+            job = process_loan_application.delay(
+                customer_id, str(loan_amount), str(interest_rate), tenure
+            )
+            status_url = request.build_absolute_uri(
+                reverse('loan_job_status', kwargs={'job_id': job.id})
+            )
+            return Response(
+                {'job_id': job.id, 'status': 'PENDING', 'status_url': status_url},
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Location': status_url}
+            )
+        
         loan_result = LoanEligibilityService.create_loan(
             customer_id, loan_amount, interest_rate, tenure
         )
@@ -86,36 +275,98 @@ def create_loan(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@extend_schema(
+    responses={200: dict},
+    parameters=[
+        OpenApiParameter(name='job_id', type=OpenApiTypes.UUID, location=OpenApiParameter.PATH)
+    ],
+    description="Status of a loan application queued with create-loan?async=1"
+)
+@api_view(['GET'])
+def loan_job_status(request, job_id):
+    """
+    Report a queued application's state, with the create-loan result once
+    it has run. Unknown or expired job IDs report PENDING, as Celery cannot
+    tell them apart from jobs still waiting in the queue.
+    """
+    job = process_loan_application.AsyncResult(str(job_id))
+    data = {'job_id': job.id, 'status': job.status}
+    if job.successful():
+        data['result'] = job.result
+    elif job.failed():
+        data['error'] = str(job.result)
+    return Response(data, status=status.HTTP_200_OK)
+
+
 @extend_schema(
     responses={200: LoanDetailSerializer},
     parameters=[
         OpenApiParameter(name='loan_id', type=OpenApiTypes.INT, location=OpenApiParameter.PATH)
     ],
-    description="Get loan details by loan ID"
+    description="Get loan details by loan ID. Supports If-None-Match and If-Modified-Since."
 )
+@condition(etag_func=_loan_etag, last_modified_func=_loan_last_modified)
 @api_view(['GET'])
 def view_loan(request, loan_id):
     """
-    Get loan details by loan ID
+    Get loan details by loan ID. Unchanged loans get a 304 from condition()
+    before this runs; otherwise the shared response cache is tried before
+    serializing.
     """
-    loan = get_object_or_404(Loan, loan_id=loan_id)
-    serializer = LoanDetailSerializer(loan)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    validators = _loan_validators(request._request, loan_id)
+    if validators is None:
+        raise Http404
+
+    etag = validators[0]
+    data = LoanResponseCache.get(loan_id, etag)
+    if LoanResponseCache.enabled():
+        record_cache_lookup('loan_response', data is not None)
+    if data is None:
+        loan = get_object_or_404(Loan.objects.select_related('customer'), loan_id=loan_id)
+        data = LoanDetailSerializer(loan).data
+        LoanResponseCache.set(loan_id, etag, data)
+    return Response(data, status=status.HTTP_200_OK)
 
 
 @extend_schema(
-    responses={200: LoanSerializer(many=True)},
+    responses={200: inline_serializer(
+        name='PaginatedLoanList',
+        fields={
+            'next': serializers.URLField(allow_null=True),
+            'previous': serializers.URLField(allow_null=True),
+            'results': LoanSerializer(many=True),
+        }
+    )},
     parameters=[
-        OpenApiParameter(name='customer_id', type=OpenApiTypes.INT, location=OpenApiParameter.PATH)
+        OpenApiParameter(name='customer_id', type=OpenApiTypes.INT, location=OpenApiParameter.PATH),
+        OpenApiParameter(name='cursor', type=OpenApiTypes.STR, description="Opaque cursor from the next/previous link"),
+        OpenApiParameter(name='page_size', type=OpenApiTypes.INT, description="Loans per page (max 1000)"),
+        OpenApiParameter(name='stream', type=OpenApiTypes.BOOL, description="Stream every loan as one unpaginated JSON array"),
     ],
-    description="Get all loans for a specific customer"
+    description="Get a customer's loans, ordered by loan ID, one page at a time"
 )
 @api_view(['GET'])
 def view_customer_loans(request, customer_id):
     """
-    Get all loans for a specific customer
+    Get a customer's loans one keyset page at a time: one query for the
+    customer and one for the page. With ?stream=1, every loan is streamed
+    as a JSON array instead.
     """
     customer = get_object_or_404(Customer, customer_id=customer_id)
     loans = Loan.objects.filter(customer=customer)
-    serializer = LoanSerializer(loans, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+
+    if _flag(request, 'stream'):
+        # Rows come from a server-side cursor and are encoded as they
+        # arrive, so memory and time to first byte do not grow with the
+        # number of loans
+        serializer = LoanSerializer(context={'customer': customer})
+        rows = loans.order_by('loan_id').iterator(chunk_size=LOAN_STREAM_CHUNK_SIZE)
+        return StreamingHttpResponse(
+            _stream_json_array(serializer.to_representation(loan) for loan in rows),
+            content_type='application/json'
+        )
+
+    paginator = LoanCursorPagination()
+    page = paginator.paginate_queryset(loans, request)
+    serializer = LoanSerializer(page, many=True, context={'customer': customer})
+    return paginator.get_paginated_response(serializer.data)